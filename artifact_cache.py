@@ -0,0 +1,149 @@
+"""下载大文件(如 Miniforge 安装脚本)到本地制品缓存
+
+流式写盘、断点续传(HTTP Range)、SHA-256 校验。缓存目录可以放在共享
+存储上，供重启后的容器或其他节点复用。
+"""
+import fcntl
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import requests
+
+# 制品缓存目录
+ARTIFACT_CACHE_DIR = Path(os.environ.get(
+    "ARTIFACT_CACHE_DIR",
+    Path.home() / ".cache" / "components_example" / "artifacts",
+))
+CHUNK_SIZE = 1024 * 1024
+# 下载中断后自动续传的次数与每次请求的超时(秒)
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = 60
+
+class ChecksumError(ValueError):
+    pass
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+def fetch_checksum(url, session=None):
+    """读取发布页附带的 <url>.sha256，取不到时返回 None"""
+    try:
+        response = (session or requests).get(f"{url}.sha256", timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        checksum = response.text.split()[0].lower()
+    except (requests.RequestException, IndexError):
+        return None
+    return checksum if len(checksum) == 64 and all(c in "0123456789abcdef" for c in checksum) else None
+
+def _validator(response):
+    """用于 If-Range 的校验值：强 ETag 优先，其次 Last-Modified，都没有时为空"""
+    etag = response.headers.get("ETag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified", "")
+
+def _discard(part):
+    part.unlink(missing_ok=True)
+    part.with_name(part.name + ".meta").unlink(missing_ok=True)
+
+def _download(url, part, digest, on_progress, session):
+    """从 part 已有的长度续传到结束，返回 (已下载字节数, 总字节数, 校验对象)
+
+    part 旁的 .meta 文件记录开始下载时服务器返回的 ETag 或 Last-Modified，
+    续传时通过 If-Range 发送；上游文件已变化时服务器返回完整内容(200)，
+    从头下载。没有 .meta 的 part 无法确认来源，直接丢弃。
+    """
+    meta = part.with_name(part.name + ".meta")
+    done = part.stat().st_size if part.exists() else 0
+    if done and not meta.exists():
+        _discard(part)
+        done = 0
+        digest = hashlib.sha256()
+    headers = {}
+    if done:
+        headers["Range"] = f"bytes={done}-"
+        validator = meta.read_text(encoding="utf-8")
+        if validator:
+            headers["If-Range"] = validator
+    with session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status_code == 416:
+            # 已下载部分即为完整文件时，Content-Range 为 "bytes */总长度"；
+            # 长度对不上说明 part 不是当前的上游文件，从头下载
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == done:
+                return done, done, digest
+            _discard(part)
+            return _download(url, part, hashlib.sha256(), on_progress, session)
+        response.raise_for_status()
+        if done and (response.status_code != 206 or not response.headers.get(
+                "Content-Range", "").startswith(f"bytes {done}-")):
+            # 服务器不支持 Range 或上游文件已变化，从头下载
+            done = 0
+            digest = hashlib.sha256()
+        if done:
+            total = response.headers["Content-Range"].rpartition("/")[2]
+            total = int(total) if total.isdigit() else None
+        else:
+            total = int(response.headers.get("Content-Length", 0)) or None
+            meta.write_text(_validator(response), encoding="utf-8")
+        with open(part, "ab" if done else "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                done += len(chunk)
+                if on_progress:
+                    on_progress(done, total)
+    return done, total, digest
+
+def download_artifact(url, filename=None, sha256=None, on_progress=None,
+                      cache_dir=None, session=None, retries=DOWNLOAD_RETRIES):
+    """返回缓存中已校验的文件路径，缓存中没有时先下载
+
+    下载内容先写入 <文件名>.part，中断后再次调用或自动重试时用 Range
+    与 If-Range 请求续传；完成并校验 SHA-256 后才改名为正式文件，所以缓存中的文件
+    总是完整的。同一缓存目录的并发下载通过文件锁串行化。
+    on_progress(已下载字节数, 总字节数或 None) 用于显示进度。
+    """
+    cache_dir = Path(cache_dir or ARTIFACT_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / (filename or url.rsplit("/", 1)[-1])
+    part = path.with_name(path.name + ".part")
+    sha256 = sha256.lower() if sha256 else None
+    session = session or requests.Session()
+
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        if path.exists():
+            if sha256 is None or sha256_file(path).hexdigest() == sha256:
+                return path
+            path.unlink()
+
+        for attempt in range(retries + 1):
+            # 续传时先把已下载部分计入校验
+            digest = sha256_file(part) if part.exists() else hashlib.sha256()
+            try:
+                done, total, digest = _download(url, part, digest, on_progress, session)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+        if total is not None and done != total:
+            # 比总长度还多的 part 无法续传，丢弃后下次从头下载
+            if done > total:
+                _discard(part)
+            raise IOError(f"下载不完整：{done}/{total} 字节")
+        if sha256 is not None and digest.hexdigest() != sha256:
+            _discard(part)
+            raise ChecksumError(f"{path.name} 校验失败：期望 {sha256}，实际 {digest.hexdigest()}")
+        os.replace(part, path)
+        part.with_name(part.name + ".meta").unlink(missing_ok=True)
+        return path
@@ -0,0 +1,166 @@
+"""按会话保存在磁盘上的命令历史，支持分页浏览与全文搜索"""
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+import streamlit as st
+
+from jobs_ui import session_id
+
+# 历史文件目录，以及超过多少天未写入的历史文件会被清理
+HISTORY_DIR = Path(os.environ.get(
+    "COMMAND_HISTORY_DIR",
+    Path(tempfile.gettempdir()) / "components_example" / "history",
+))
+HISTORY_MAX_AGE_DAYS = 7
+# 每个会话在内存中缓存的已解压输出上限(字符数)
+HISTORY_MEMORY_CAP = int(os.environ.get("COMMAND_HISTORY_MEMORY_CAP", str(2 * 1024 * 1024)))
+HISTORY_PAGE_SIZE = 10
+# 记录头：元数据长度、压缩后输出长度
+RECORD_HEADER = struct.Struct("<II")
+
+class CommandHistory:
+    """只追加的压缩历史文件，内存中只保留偏移索引和少量解压缓存
+
+    每条记录为 记录头 + 元数据 JSON(时间、命令、返回码) + zlib 压缩的输出
+    JSON(stdout、stderr、error)。打开时只读取记录头和元数据重建索引；
+    输出按需解压，解压结果放入总大小不超过 memory_cap 的 LRU 缓存。
+    """
+
+    def __init__(self, path, memory_cap=HISTORY_MEMORY_CAP):
+        self.path = Path(path)
+        self.memory_cap = memory_cap
+        self._lock = threading.Lock()
+        self._index = []
+        self._cache = OrderedDict()
+        self._cached_size = 0
+        self._load_index()
+
+    def _load_index(self):
+        if not self.path.exists():
+            return
+        size = self.path.stat().st_size
+        end = 0
+        with open(self.path, "rb") as f:
+            while end + RECORD_HEADER.size <= size:
+                f.seek(end)
+                meta_len, body_len = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                record_end = end + RECORD_HEADER.size + meta_len + body_len
+                if record_end > size:
+                    break
+                self._index.append((end, meta_len, body_len, json.loads(f.read(meta_len))))
+                end = record_end
+        # 截掉写入中断留下的不完整记录
+        if size > end:
+            os.truncate(self.path, end)
+
+    def __len__(self):
+        return len(self._index)
+
+    def append(self, command, result):
+        """追加一条记录，result 为 execute() 格式的字典"""
+        meta = json.dumps({
+            "time": time.time(),
+            "command": command,
+            "returncode": result.get("returncode"),
+        }, ensure_ascii=False).encode()
+        output = {key: result.get(key) or "" for key in ("stdout", "stderr", "error")}
+        body = zlib.compress(json.dumps(output, ensure_ascii=False).encode())
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(RECORD_HEADER.pack(len(meta), len(body)) + meta + body)
+            self._index.append((offset, len(meta), len(body), json.loads(meta)))
+
+    def _output(self, i):
+        with self._lock:
+            if i in self._cache:
+                self._cache.move_to_end(i)
+                return self._cache[i]
+            offset, meta_len, body_len, _ = self._index[i]
+            with open(self.path, "rb") as f:
+                f.seek(offset + RECORD_HEADER.size + meta_len)
+                output = json.loads(zlib.decompress(f.read(body_len)))
+            size = sum(len(text) for text in output.values())
+            if size <= self.memory_cap:
+                self._cache[i] = output
+                self._cached_size += size
+                while self._cached_size > self.memory_cap:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_size -= sum(len(text) for text in evicted.values())
+            return output
+
+    def entry(self, i):
+        return {**self._index[i][3], **self._output(i), "index": i}
+
+    def page(self, page, page_size=HISTORY_PAGE_SIZE):
+        """第 page 页(从 0 开始)的记录，最新的在前"""
+        end = len(self._index) - page * page_size
+        return [self.entry(i) for i in range(end - 1, max(end - page_size, 0) - 1, -1)]
+
+    def search(self, query, limit=HISTORY_PAGE_SIZE):
+        """在命令和输出中不区分大小写地查找，返回最新的 limit 条匹配"""
+        query = query.lower()
+        matches = []
+        for i in range(len(self._index) - 1, -1, -1):
+            meta = self._index[i][3]
+            if query in meta["command"].lower() or any(
+                query in text.lower() for text in self._output(i).values()
+            ):
+                matches.append(self.entry(i))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+def _prune_old_histories():
+    cutoff = time.time() - HISTORY_MAX_AGE_DAYS * 86400
+    for path in HISTORY_DIR.glob("*.log"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+def get_history(name):
+    """当前会话在某个页面的命令历史；会话由 URL 参数 sid 标识，刷新后仍可找回"""
+    key = f"command_history_{name}"
+    path = HISTORY_DIR / f"{name}-{session_id()}.log"
+    history = st.session_state.get(key)
+    if history is None or history.path != path:
+        _prune_old_histories()
+        history = st.session_state[key] = CommandHistory(path)
+    return history
+
+def history_panel(history, key):
+    """分页浏览与搜索命令历史"""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        query = st.text_input("搜索历史命令和输出", key=f"{key}_query")
+    pages = max(1, -(-len(history) // HISTORY_PAGE_SIZE))
+    with col2:
+        page = st.number_input("页码", min_value=1, max_value=pages, value=1,
+                               disabled=bool(query), key=f"{key}_page")
+
+    entries = history.search(query) if query else history.page(page - 1)
+    if query:
+        st.caption(f"最近 {len(entries)} 条匹配")
+    else:
+        st.caption(f"共 {len(history)} 条，第 {page}/{pages} 页")
+    for entry in entries:
+        when = time.strftime("%m-%d %H:%M:%S", time.localtime(entry["time"]))
+        # 页面通常把历史放在 expander 中，而 expander 不能嵌套
+        with st.container(border=True):
+            st.markdown(f"**#{entry['index'] + 1}** `{entry['command'][:80]}` · {when} · 返回 {entry['returncode']}")
+            if entry["error"]:
+                st.error(entry["error"])
+            if entry["stdout"]:
+                st.code(entry["stdout"], language="bash")
+            if entry["stderr"]:
+                st.code(entry["stderr"], language="bash")
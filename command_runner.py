@@ -0,0 +1,760 @@
+"""页面共用的命令执行工具
+
+放在项目根目录(与 app.py 同级)而不是 pages/ 下，避免被 Streamlit 当作页面。
+"""
+import base64
+import codecs
+import os
+import queue
+import re
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+
+try:
+    import fcntl
+    import pty
+    import select
+    import struct
+    import termios
+except ImportError:
+    # Windows 上没有伪终端，ShellSession 不可用
+    pty = None
+
+# 完整输出写入的日志目录
+LOG_DIR = Path(os.environ.get(
+    "COMMAND_LOG_DIR",
+    Path(tempfile.gettempdir()) / "components_example" / "logs",
+))
+# 日志目录中最多保留的文件数，以及超过多少天未写入的日志会被清理
+LOG_FILES_KEPT = int(os.environ.get("COMMAND_LOG_FILES_KEPT", "1000"))
+LOG_MAX_AGE_DAYS = 7
+# 内存中每个输出流只保留最后这么多行
+TAIL_LINES = 500
+# 界面刷新回调的最小间隔(秒)，避免每一行输出都重绘
+UPDATE_INTERVAL = 0.3
+# 持久 shell 空闲多久(秒)后被回收，以及启动时等待 .bashrc 执行完的时间
+SHELL_IDLE_TIMEOUT = float(os.environ.get("SHELL_IDLE_TIMEOUT", "900"))
+SHELL_START_TIMEOUT = 60
+# 后台任务：工作线程数、同时运行的重任务(conda 求解、pip 安装)上限、
+# 每个会话同时排队/运行的任务上限，以及每个会话保留的已结束任务数
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+HEAVY_JOB_LIMIT = int(os.environ.get("HEAVY_JOB_LIMIT", "1"))
+MAX_ACTIVE_JOBS = int(os.environ.get("MAX_ACTIVE_JOBS", "3"))
+FINISHED_JOBS_KEPT = 20
+# 已结束任务在所有会话中保留的最长时间(秒)与总数上限，防止被遗弃的会话
+# 的任务一直占用内存
+FINISHED_JOB_MAX_AGE = float(os.environ.get("FINISHED_JOB_MAX_AGE", "86400"))
+FINISHED_JOBS_TOTAL = 500
+# 只读命令结果缓存的有效期(秒)与条目上限
+COMMAND_CACHE_TTL = float(os.environ.get("COMMAND_CACHE_TTL", "60"))
+COMMAND_CACHE_SIZE = 256
+# 失效全部缓存的标签，用于无法判断作用环境的修改命令
+ANY_ENV = "*"
+# 识别可缓存的只读命令(匹配前空白已归一化)与会修改环境的命令
+_ENV_OPTION = re.compile(r"(?:^|\s)(?:-n|--name|-p|--prefix)[\s=]+(\S+)")
+_PIPELINE = re.compile(r"[;&|<>`$]")
+_CONDA_ENVS = re.compile(r"(?:conda|mamba) (?:env list|info (?:--envs|-e))(?: --json)?")
+_CONDA_LIST = re.compile(r"(?:conda|mamba) list(?: [\w.=*@/-]+)*")
+_PIP_READ = re.compile(r"(?:pip3?|python3? -m pip) (?:list|freeze|--version|-V)(?: [\w.=-]+)*")
+_DPKG_LIST = re.compile(r"dpkg (?:-l|--list)(?: [\w.*+-]+)*")
+_CONDA_MUTATION = re.compile(
+    r"\b(?:conda|mamba|micromamba)\s+(?:env\s+)?(install|update|upgrade|remove|uninstall|create)\b"
+)
+_PIP_MUTATION = re.compile(r"\bpip3?\s+(?:install|uninstall)\b")
+_APT_MUTATION = re.compile(
+    r"\b(?:apt|apt-get)\s+(?:install|remove|purge|upgrade|autoremove)\b"
+    r"|\bdpkg\s+(?:-i|-r|-P|--install|--remove|--purge)\b"
+)
+# 会占用大量 CPU/内存/网络的命令
+HEAVY_COMMAND = re.compile(
+    r"\b(?:conda|mamba|micromamba)\s+(?:env\s+)?(?:create|install|update|upgrade|remove)\b"
+    r"|\bpip3?\s+install\b"
+)
+
+_singleton_lock = threading.Lock()
+
+def _prune_logs():
+    """删除过期的日志，并只保留最近写入的 LOG_FILES_KEPT 个"""
+    cutoff = time.time() - LOG_MAX_AGE_DAYS * 86400
+    logs = []
+    for path in LOG_DIR.glob("cmd-*.log"):
+        try:
+            logs.append((path.stat().st_mtime, path))
+        except OSError:
+            pass
+    logs.sort(reverse=True)
+    for i, (mtime, path) in enumerate(logs):
+        if i >= LOG_FILES_KEPT or mtime < cutoff:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+def _new_log_file():
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    _prune_logs()
+    fd, path = tempfile.mkstemp(prefix=time.strftime("cmd-%Y%m%d-%H%M%S-"), suffix=".log", dir=LOG_DIR)
+    return os.fdopen(fd, "w", encoding="utf-8", errors="replace"), path
+
+def _pump(stream, name, lines):
+    for line in iter(stream.readline, ""):
+        lines.put((name, line))
+    stream.close()
+    lines.put((name, None))
+
+def _kill(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        process.kill()
+
+class OutputSink:
+    """收集命令输出：内存中保留尾部、完整内容写入日志、节流通知界面"""
+
+    def __init__(self, on_output=None, tail_lines=TAIL_LINES):
+        self.on_output = on_output
+        self.log, self.log_file = _new_log_file()
+        self.tails = {"stdout": deque(maxlen=tail_lines), "stderr": deque(maxlen=tail_lines)}
+        self.counts = {"stdout": 0, "stderr": 0}
+        self._last_update = 0.0
+        self._dirty = False
+
+    def write(self, name, line):
+        self.tails[name].append(line)
+        self.counts[name] += 1
+        self.log.write(line if name == "stdout" else f"[stderr] {line}")
+        self._dirty = True
+
+    def text(self, name):
+        return "".join(self.tails[name])
+
+    def notify(self, force=False):
+        """有新输出且距上次通知超过 UPDATE_INTERVAL 时回调 on_output"""
+        if not self.on_output or not (self._dirty or force):
+            return
+        if force or time.monotonic() - self._last_update >= UPDATE_INTERVAL:
+            self.on_output(self.text("stdout"), self.text("stderr"))
+            self._last_update, self._dirty = time.monotonic(), False
+
+    def close(self, returncode, **extra):
+        """关闭日志并返回结果字典"""
+        self.log.close()
+        result = {
+            "stdout": self.text("stdout"),
+            "stderr": self.text("stderr"),
+            "returncode": returncode,
+            "log_file": self.log_file,
+            "truncated": any(self.counts[name] > len(self.tails[name]) for name in self.tails),
+            **extra,
+        }
+        self.notify(force=True)
+        return result
+
+def stream_command(args, on_output=None, timeout=None, tail_lines=TAIL_LINES, cancel=None, **popen_kwargs):
+    """执行命令并逐行读取 stdout/stderr
+
+    on_output(stdout_tail, stderr_tail) 在有新输出时被调用(最多每
+    UPDATE_INTERVAL 秒一次，结束时必定再调用一次)。内存中只保留每个流的
+    最后 tail_lines 行，完整输出按到达顺序写入日志文件，stderr 行带
+    "[stderr] " 前缀。
+
+    返回 {"stdout", "stderr", "returncode", "log_file", "truncated"}；超时
+    或 cancel(threading.Event)被置位时进程组被杀死，并额外带有 "error" 字段。
+    """
+    sink = OutputSink(on_output, tail_lines)
+    lines = queue.Queue()
+    extra = {}
+
+    process = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        start_new_session=True,
+        **popen_kwargs,
+    )
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, "stdout", lines), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, "stderr", lines), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    open_streams = 2
+    try:
+        while open_streams:
+            if deadline and time.monotonic() > deadline:
+                _kill(process)
+                extra["error"] = f"命令执行超时（超过{timeout}秒）"
+                break
+            if cancel is not None and cancel.is_set():
+                _kill(process)
+                extra["error"] = "命令已取消"
+                break
+            try:
+                name, line = lines.get(timeout=0.1)
+            except queue.Empty:
+                name = line = None
+            if name and line is None:
+                open_streams -= 1
+            elif line is not None:
+                sink.write(name, line)
+            sink.notify()
+    except BaseException as e:
+        # on_output 中可能抛出 Streamlit 的 RerunException/StopException，
+        # 不能让子进程脱离超时和取消的控制继续运行
+        _kill(process)
+        process.wait()
+        sink.on_output = None
+        sink.close(process.returncode, error=f"命令被中断：{type(e).__name__}")
+        raise
+
+    process.wait()
+    return sink.close(process.returncode, **extra)
+
+def execute(command, on_output=None, timeout=None, cancel=None, cwd=None, env=None,
+            shell=None, interactive=False, cache=False, tail_lines=TAIL_LINES):
+    """所有页面共用的命令执行入口
+
+    command 为字符串，交给 bash 解析；传入 shell(ShellSession)时在该持久
+    shell 中执行，否则新开 bash(interactive=True 时加载 .bashrc)。
+    cache=True 时，只读命令(conda env list、conda list、pip list、
+    pip --version、dpkg -l 等)的成功结果在 COMMAND_CACHE_TTL 秒内按相同的
+    环境、PATH 与工作目录复用，结果中带 "cached_at"；任何来源的安装/删除/
+    创建命令都会使同一环境的缓存失效。返回值格式与 stream_command 相同。
+    """
+    def run():
+        if shell is not None:
+            return shell.run(command, on_output=on_output, timeout=timeout, tail_lines=tail_lines)
+        args = ["bash", "-i", "-c", command] if interactive else ["bash", "-c", command]
+        return stream_command(args, on_output=on_output, timeout=timeout, tail_lines=tail_lines,
+                              cancel=cancel, cwd=cwd, env=env)
+
+    results = get_result_cache()
+    # 持久 shell 中可能已 conda activate，复合命令中的 -n/-p 也未必属于 conda，
+    # 这两种情况都无法判断作用的环境
+    env_key = None
+    if not _PIPELINE.search(command):
+        env_key = _env_key(command, None if shell is not None else env or os.environ)
+    mutated = _mutation_tags(command, env_key)
+    if mutated is not None:
+        try:
+            return run()
+        finally:
+            results.invalidate(mutated)
+
+    tags = _readonly_tags(command, env_key) if cache else None
+    if tags is None:
+        return run()
+    # 同一命令在不同环境、PATH 或工作目录下可能解析到不同的 conda/pip，都计入键；
+    # 持久 shell 中只有不依赖环境的命令可缓存，按进程环境计算
+    resolve_env = env if shell is None and env is not None else os.environ
+    key = (" ".join(command.split()), env_key, resolve_env.get("PATH", ""),
+           os.path.abspath(cwd) if cwd and shell is None else os.getcwd())
+    result = results.get_or_run(key, tags, run)
+    if on_output and "cached_at" in result:
+        on_output(result["stdout"], result["stderr"])
+    return result
+
+class ResultCache:
+    """只读命令结果的 TTL 缓存，按标签(环境)失效
+
+    同一命令并发执行时只运行一次，其余调用等待并复用结果。每个标签
+    有一个版本号，命令执行期间若标签被失效，结果不写入缓存，避免把
+    安装前的旧结果存下来。
+    """
+
+    def __init__(self, ttl=COMMAND_CACHE_TTL, max_entries=COMMAND_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._versions = {}
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result, tags, stored = entry
+            if time.time() - stored > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return {**result, "cached_at": stored}
+
+    def get_or_run(self, key, tags, run):
+        result = self._lookup(key)
+        if result is not None:
+            return result
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            result = self._lookup(key)
+            if result is not None:
+                return result
+            tags = frozenset(tags) | {ANY_ENV}
+            with self._lock:
+                versions = {tag: self._versions.get(tag, 0) for tag in tags}
+            result = run()
+            with self._lock:
+                self._key_locks.pop(key, None)
+                if result.get("returncode") == 0 and not result.get("error") \
+                        and versions == {tag: self._versions.get(tag, 0) for tag in tags}:
+                    self._entries[key] = (result, tags, time.time())
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return result
+
+    def invalidate(self, tags):
+        """删除带有任一标签的缓存；tags 含 ANY_ENV 时清空全部"""
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            if ANY_ENV in tags:
+                self._entries.clear()
+                return
+            for key in [k for k, (_, t, _) in self._entries.items() if t & tags]:
+                del self._entries[key]
+
+_result_cache = None
+
+def get_result_cache():
+    """进程内共享的结果缓存，所有页面、所有会话共用"""
+    global _result_cache
+    with _singleton_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
+
+def _is_root_prefix(path, env):
+    """path 是否为 conda 根环境：与 CONDA_EXE 所在安装一致，或带有 condabin 目录"""
+    path = os.path.realpath(path)
+    conda_exe = (env or {}).get("CONDA_EXE") or os.environ.get("CONDA_EXE")
+    if conda_exe and path == os.path.dirname(os.path.dirname(os.path.realpath(conda_exe))):
+        return True
+    return os.path.isdir(os.path.join(path, "condabin"))
+
+def _env_key(command, env):
+    """命令作用的 conda 环境：显式的 -n/-p，否则为 env 中激活的环境；未知时为 None
+
+    根环境无论写作 -n base、-p <根路径> 还是未激活任何环境都记为 "base"，
+    其他路径取目录名，使只读命令与修改命令得到相同的键。
+    """
+    match = _ENV_OPTION.search(command)
+    if match:
+        name = match.group(1)
+    elif env is None:
+        return None
+    else:
+        name = env.get("CONDA_DEFAULT_ENV", "")
+    if not name or name == "base":
+        return "base"
+    if "/" in name:
+        return "base" if _is_root_prefix(name, env) else os.path.basename(os.path.normpath(name))
+    return name
+
+def _readonly_tags(command, env_key):
+    """可缓存的只读命令返回其依赖的标签，否则返回 None"""
+    command = " ".join(command.split())
+    if _PIPELINE.search(command):
+        return None
+    if _CONDA_ENVS.fullmatch(command):
+        return frozenset({"conda-envs"})
+    if _DPKG_LIST.fullmatch(command):
+        return frozenset({"dpkg"})
+    if env_key is not None and (_CONDA_LIST.fullmatch(command) or _PIP_READ.fullmatch(command)):
+        return frozenset({f"env:{env_key}"})
+    return None
+
+def _mutation_tags(command, env_key):
+    """修改环境的命令返回需要失效的标签，否则返回 None"""
+    tags = set()
+    for match in _CONDA_MUTATION.finditer(command):
+        tags.add(f"env:{env_key}" if env_key is not None else ANY_ENV)
+        if match.group(1) in ("create", "remove"):
+            tags.add("conda-envs")
+    if _PIP_MUTATION.search(command):
+        tags.add(f"env:{env_key}" if env_key is not None else ANY_ENV)
+    if _APT_MUTATION.search(command):
+        tags.add("dpkg")
+    return frozenset(tags) if tags else None
+
+class ShellSession:
+    """在伪终端中长期运行的 bash，多条命令复用同一个 shell
+
+    .bashrc 与 conda 初始化只在启动时执行一次，cd、conda activate、
+    export 等状态在命令之间保留。每条命令经 base64 编码后 eval，
+    结束后输出带随机 token 的结束标记及退出码，以此可靠判断命令完成。
+    伪终端合并了 stdout 与 stderr，全部计入 stdout；命令的 stdin 为 /dev/null。
+    """
+
+    def __init__(self, env=None, columns=200):
+        self.master_fd, slave_fd = pty.openpty()
+        fcntl.ioctl(slave_fd, termios.TIOCSWINSZ, struct.pack("HHHH", 50, columns, 0, 0))
+        self.process = subprocess.Popen(
+            ["bash", "-i"],
+            stdin=slave_fd,
+            stdout=slave_fd,
+            stderr=slave_fd,
+            env=env,
+            preexec_fn=_make_controlling_tty,
+            close_fds=True,
+        )
+        os.close(slave_fd)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        # 关闭回显和提示符，不记录 eval 行到历史文件，丢弃 .bashrc 等启动输出
+        self._send("stty -echo; PS1=''; PS2=''; unset PROMPT_COMMAND HISTFILE; export TERM=dumb")
+        self.run(":", timeout=SHELL_START_TIMEOUT)
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def _send(self, text):
+        os.write(self.master_fd, (text + "\n").encode())
+
+    def _foreground_is_shell(self):
+        """伪终端的前台进程组是否已回到 bash 本身(前台命令已结束)"""
+        try:
+            return os.tcgetpgrp(self.master_fd) == self.process.pid
+        except OSError:
+            return True
+
+    def _take_partial(self):
+        """取出缓冲区中尚未换行的输出(如 y/n 提示)，可能是结束标记开头的部分留在缓冲区"""
+        cut = self._buffer.find("__")
+        if cut < 0:
+            cut = len(self._buffer)
+        partial, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return partial
+
+    def _read_lines(self, timeout):
+        """等待最多 timeout 秒读取输出，返回完整的行(不含换行符)"""
+        ready, _, _ = select.select([self.master_fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.master_fd, 65536)
+        except OSError:
+            data = b""
+        if not data:
+            raise EOFError("shell 已退出")
+        self._buffer += self._decoder.decode(data).replace("\r", "")
+        *lines, self._buffer = self._buffer.split("\n")
+        return lines
+
+    def run(self, command, on_output=None, timeout=None, tail_lines=TAIL_LINES):
+        """在该 shell 中执行命令，返回值格式与 stream_command 相同
+
+        超时或 on_output 抛出异常时先向前台进程发送 Ctrl-C，仍未结束则关闭
+        整个 shell。
+        """
+        with self.lock:
+            if not self.alive():
+                return {"stdout": "", "stderr": "", "returncode": None, "log_file": None,
+                        "truncated": False, "error": "shell 已退出"}
+            self.last_used = time.monotonic()
+            token = uuid.uuid4().hex
+            encoded = base64.b64encode(command.encode()).decode()
+            # 界面无法向命令输入内容，stdin 接 /dev/null，等待输入的命令立即结束而不是挂起
+            self._send(f"eval \"$(printf %s {encoded} | base64 -d)\" </dev/null; {_marker_command(token)}")
+
+            sink = OutputSink(on_output, tail_lines)
+            deadline = time.monotonic() + timeout if timeout else None
+            interrupted = marker_resent = False
+            returncode, extra = None, {}
+            try:
+                while returncode is None:
+                    if deadline and time.monotonic() > deadline:
+                        if interrupted:
+                            self.close()
+                            extra["error"] = f"命令执行超时（超过{timeout}秒），shell 已重置"
+                            break
+                        os.write(self.master_fd, b"\x03")
+                        interrupted = True
+                        deadline = time.monotonic() + 5
+                        extra["error"] = f"命令执行超时（超过{timeout}秒），已中断"
+                    # Ctrl-C 会让 bash 丢弃该行剩余部分(包括结束标记)，需重新发送；
+                    # 等前台命令真正结束后再发，否则仍在读终端的命令会把标记吃掉
+                    if interrupted and not marker_resent and self._foreground_is_shell():
+                        self._send(_marker_command(token, 130))
+                        marker_resent = True
+                    lines = self._read_lines(0.1)
+                    if not lines and self._buffer:
+                        partial = self._take_partial()
+                        if partial:
+                            sink.write("stdout", partial)
+                    for line in lines:
+                        match = _MARKER.search(line)
+                        if match:
+                            line = line[:match.start()]
+                        if line:
+                            sink.write("stdout", line + "\n")
+                        # 其他 token 的标记来自之前被中断的命令，忽略
+                        if match and match.group(1) == token:
+                            returncode = int(match.group(2))
+                            break
+                    sink.notify()
+            except EOFError:
+                extra["error"] = "shell 已退出"
+                self.close()
+            except BaseException as e:
+                # on_output 中可能抛出 Streamlit 的 RerunException/StopException；
+                # 命令仍在前台运行时下一条命令会被当作它的输入，必须先中断并
+                # 读完它的输出
+                if returncode is None:
+                    self._interrupt(token)
+                sink.on_output = None
+                sink.close(returncode, error=f"命令被中断：{type(e).__name__}")
+                raise
+            self.last_used = time.monotonic()
+            return sink.close(returncode, **extra)
+
+    def _interrupt(self, token, timeout=5):
+        """向前台命令发送 Ctrl-C 并丢弃输出直到 token 的结束标记，等不到则关闭 shell"""
+        try:
+            os.write(self.master_fd, b"\x03")
+            marker_resent = False
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                if not marker_resent and self._foreground_is_shell():
+                    self._send(_marker_command(token, 130))
+                    marker_resent = True
+                for line in self._read_lines(0.1):
+                    match = _MARKER.search(line)
+                    if match and match.group(1) == token:
+                        return
+        except (EOFError, OSError):
+            pass
+        self.close()
+
+    def close(self):
+        if self.alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.process.wait()
+        if self.master_fd is not None:
+            os.close(self.master_fd)
+            self.master_fd = None
+
+_MARKER = re.compile(r"__DONE_([0-9a-f]{32})_(\d+)__")
+
+def _marker_command(token, status='"$?"'):
+    return f"printf '__DONE_%s_%s__\\n' {token} {status}"
+
+def _make_controlling_tty():
+    # 在子进程中：新建会话并把伪终端设为控制终端，使交互式 bash 的作业控制正常工作
+    os.setsid()
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+class ShellRegistry:
+    """进程内所有会话的 ShellSession，后台线程回收空闲超时的 shell"""
+
+    def __init__(self, idle_timeout=SHELL_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._shells = {}
+        threading.Thread(target=self._reap_loop, name="shell-reaper", daemon=True).start()
+
+    def get(self, key, env=None):
+        """返回该会话的 shell，不存在或已退出时新建
+
+        启动 shell 可能要等 .bashrc 执行很久，所以在锁外新建，避免阻塞其他
+        会话；同一会话并发新建时保留先放入的那个，多余的关闭。
+        """
+        with self._lock:
+            shell = self._shells.get(key)
+            if shell is not None and shell.alive():
+                return shell
+        created = ShellSession(env=env)
+        with self._lock:
+            shell = self._shells.get(key)
+            if shell is None or not shell.alive():
+                stale, shell = shell, created
+                self._shells[key] = shell
+            else:
+                stale = created
+        if stale is not None:
+            stale.close()
+        return shell
+
+    def peek(self, key):
+        with self._lock:
+            return self._shells.get(key)
+
+    def close(self, key):
+        with self._lock:
+            shell = self._shells.pop(key, None)
+        if shell:
+            shell.close()
+
+    def reap(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, shell in self._shells.items()
+                    if not shell.alive()
+                    or (not shell.lock.locked() and now - shell.last_used > self.idle_timeout)]
+            shells = [self._shells.pop(key) for key in idle]
+        for shell in shells:
+            shell.close()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(60)
+            self.reap()
+
+def is_heavy(command):
+    return bool(HEAVY_COMMAND.search(command))
+
+class JobLimitError(RuntimeError):
+    pass
+
+class Job:
+    """一个后台命令任务，状态为 queued/running/done/failed/cancelled"""
+
+    def __init__(self, owner, command, run, heavy):
+        self.id = uuid.uuid4().hex[:8]
+        self.owner = owner
+        self.command = command
+        self.heavy = heavy
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started = self.finished = None
+        self.stdout = self.stderr = ""
+        self.result = None
+        self.cancel_event = threading.Event()
+        self._run = run
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def _on_output(self, stdout, stderr):
+        self.stdout, self.stderr = stdout, stderr
+
+    def execute(self):
+        self.status, self.started = "running", time.time()
+        try:
+            self.result = self._run(on_output=self._on_output, cancel=self.cancel_event)
+        except Exception as e:
+            self.result = {"error": str(e)}
+        self.finished = time.time()
+        if self.cancel_event.is_set():
+            self.status = "cancelled"
+        elif self.result.get("returncode") == 0 and not self.result.get("error"):
+            self.status = "done"
+        else:
+            self.status = "failed"
+
+class JobScheduler:
+    """进程内共享的后台任务调度器
+
+    固定数量的工作线程按提交顺序取任务；重任务同时最多运行
+    heavy_limit 个，轮不到的重任务不会阻塞后面的轻任务。每个会话同时
+    排队/运行的任务不超过 max_active 个，以免单个用户占满主机。
+    run(on_output, cancel) 负责实际执行，返回 stream_command 格式的字典。
+    """
+
+    def __init__(self, workers=JOB_WORKERS, heavy_limit=HEAVY_JOB_LIMIT, max_active=MAX_ACTIVE_JOBS):
+        self.heavy_limit = heavy_limit
+        self.max_active = max_active
+        self._cond = threading.Condition()
+        self._pending = []
+        self._jobs = {}
+        self._heavy_running = 0
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, owner, command, run, heavy=None):
+        job = Job(owner, command, run, is_heavy(command) if heavy is None else heavy)
+        with self._cond:
+            if sum(j.active for j in self._jobs.values() if j.owner == owner) >= self.max_active:
+                raise JobLimitError(f"每个会话最多同时运行 {self.max_active} 个后台任务")
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._prune(owner)
+            self._cond.notify_all()
+        return job
+
+    def jobs(self, owner):
+        """该会话的任务，最新的在前"""
+        with self._cond:
+            return sorted((j for j in self._jobs.values() if j.owner == owner),
+                          key=lambda j: j.submitted, reverse=True)
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or not job.active:
+                return
+            job.cancel_event.set()
+            if job in self._pending:
+                self._pending.remove(job)
+                job.status, job.finished = "cancelled", time.time()
+
+    def _prune(self, owner):
+        """每个会话只保留最近的已结束任务，并按时间与总数清理所有会话的"""
+        finished = [j for j in self._jobs.values() if j.owner == owner and not j.active]
+        finished.sort(key=lambda j: j.submitted)
+        for job in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self._jobs[job.id]
+        cutoff = time.time() - FINISHED_JOB_MAX_AGE
+        finished = sorted((j for j in self._jobs.values() if not j.active), key=lambda j: j.finished)
+        excess = len(finished) - FINISHED_JOBS_TOTAL
+        for i, job in enumerate(finished):
+            if i < excess or job.finished < cutoff:
+                del self._jobs[job.id]
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                for job in self._pending:
+                    if not job.heavy or self._heavy_running < self.heavy_limit:
+                        self._pending.remove(job)
+                        self._heavy_running += job.heavy
+                        return job
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            try:
+                job.execute()
+            finally:
+                with self._cond:
+                    self._heavy_running -= job.heavy
+                    self._prune(job.owner)
+                    self._cond.notify_all()
+
+_scheduler = None
+
+def get_scheduler():
+    """所有页面共用同一个调度器，并发上限才对整个进程生效"""
+    global _scheduler
+    with _singleton_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
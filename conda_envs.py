@@ -0,0 +1,169 @@
+"""conda 环境创建：按规格哈希缓存求解结果(显式锁文件)并支持从模板克隆
+
+同一规格第一次创建时完整求解，然后用 conda list --explicit --md5 导出
+锁文件；之后创建直接按锁文件中的包 URL 安装，跳过求解。克隆时先按锁
+文件建好模板环境，再 conda create --clone，包文件从 pkgs 缓存硬链接。
+"""
+import hashlib
+import json
+import os
+import platform
+import re
+import shlex
+import time
+from pathlib import Path
+
+from command_runner import execute
+
+# 锁文件目录，可放在共享存储上供其他节点复用
+CONDA_LOCK_DIR = Path(os.environ.get(
+    "CONDA_LOCK_DIR",
+    Path.home() / ".cache" / "components_example" / "conda-locks",
+))
+TEMPLATE_PREFIX = "tmpl-"
+CONDA_TIMEOUT = 3600
+
+def _platform():
+    return f"{platform.system()}-{platform.machine()}".lower()
+
+def _normalize_yaml(text):
+    """去掉注释、空行和行尾空白，使只改了注释的文件得到相同哈希"""
+    lines = (re.sub(r"\s+#.*$|^\s*#.*$", "", line).rstrip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line.strip())
+
+def parse_create_command(command):
+    """识别可以走锁文件缓存的创建命令，返回创建计划；其他命令返回 None
+
+    支持 conda create -n 名称 [-c 频道]... [--override-channels] [-y] 包...
+    与 conda env create [-f 文件] [-n 名称] [-y]。
+    """
+    if re.search(r"[;&|<>`$]", command):
+        return None
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return None
+    if tokens[:2] == ["conda", "create"]:
+        plan = {"kind": "specs", "name": None, "channels": [], "specs": [], "override_channels": False}
+        args = iter(tokens[2:])
+        for token in args:
+            if token in ("-n", "--name"):
+                plan["name"] = next(args, None)
+            elif token in ("-c", "--channel"):
+                plan["channels"].append(next(args, None))
+            elif token == "--override-channels":
+                plan["override_channels"] = True
+            elif token in ("-y", "--yes"):
+                continue
+            elif token.startswith("-"):
+                return None
+            else:
+                plan["specs"].append(token)
+        if not plan["name"] or not plan["specs"] or None in plan["channels"]:
+            return None
+        return plan
+    if tokens[:3] == ["conda", "env", "create"]:
+        path, name = "environment.yml", None
+        args = iter(tokens[3:])
+        for token in args:
+            if token in ("-f", "--file"):
+                path = next(args, None)
+            elif token in ("-n", "--name"):
+                name = next(args, None)
+            elif token in ("-y", "--yes"):
+                continue
+            else:
+                return None
+        return file_plan(path, name) if path and os.path.isfile(path) else None
+    return None
+
+def file_plan(path, name=None):
+    """由环境文件生成创建计划；文件中带 pip 依赖时锁文件无法覆盖，返回 None"""
+    text = Path(path).read_text(encoding="utf-8")
+    if re.search(r"^\s*-\s*pip\s*:", text, re.MULTILINE):
+        return None
+    if name is None:
+        match = re.search(r"^name:\s*(\S+)", text, re.MULTILINE)
+        name = match.group(1) if match else None
+    return {"kind": "file", "name": name, "file": str(path)}
+
+def spec_hash(plan):
+    """规格哈希：与环境名无关，包含平台、频道顺序与排序后的包规格"""
+    if plan["kind"] == "file":
+        spec = {"environment": _normalize_yaml(Path(plan["file"]).read_text(encoding="utf-8"))}
+    else:
+        spec = {
+            "channels": plan["channels"],
+            "override_channels": plan["override_channels"],
+            "specs": sorted(plan["specs"]),
+        }
+    spec["platform"] = _platform()
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+def lock_path(plan):
+    return CONDA_LOCK_DIR / f"{spec_hash(plan)}.txt"
+
+def _solve_command(plan, name):
+    if plan["kind"] == "file":
+        return f"conda env create -f {shlex.quote(plan['file'])} -n {shlex.quote(name)}"
+    args = ["conda", "create", "-y", "-n", name]
+    for channel in plan["channels"]:
+        args += ["-c", channel]
+    if plan["override_channels"]:
+        args.append("--override-channels")
+    return shlex.join(args + plan["specs"])
+
+def _env_exists(name):
+    result = execute("conda env list --json", cache=True)
+    try:
+        prefixes = json.loads(result["stdout"])["envs"]
+    except (KeyError, ValueError):
+        return False
+    return any(os.path.basename(prefix) == name for prefix in prefixes)
+
+def create_environment(plan, clone=False, force_solve=False, on_output=None, cancel=None):
+    """按计划创建环境，返回 execute() 格式的字典，额外带有：
+
+    timings   [(阶段, 秒数)]，阶段为 求解+链接、导出锁文件、按锁文件链接、克隆
+    lock_file 使用或生成的锁文件路径
+    lock_hit  是否命中已有锁文件(跳过求解)
+    """
+    name = plan["name"]
+    if not name:
+        return {"stdout": "", "stderr": "", "returncode": None, "error": "未指定环境名（-n）"}
+    lock = lock_path(plan)
+    lock_hit = lock.exists() and not force_solve
+    # 克隆时先建模板环境，再从模板克隆
+    target = TEMPLATE_PREFIX + lock.stem[:12] if clone else name
+    timings = []
+
+    def timed(phase, command, **kwargs):
+        start = time.perf_counter()
+        result = execute(command, on_output=on_output, cancel=cancel, timeout=CONDA_TIMEOUT, **kwargs)
+        timings.append((phase, time.perf_counter() - start))
+        return result
+
+    def finish(result):
+        return {**result, "timings": timings, "lock_file": str(lock), "lock_hit": lock_hit}
+
+    if force_solve or not (clone and _env_exists(target)):
+        if lock_hit:
+            result = timed("按锁文件链接", f"conda create -y -n {shlex.quote(target)} --file {shlex.quote(str(lock))}")
+            if result["returncode"] != 0:
+                return finish(result)
+        else:
+            result = timed("求解+链接", _solve_command(plan, target))
+            if result["returncode"] != 0:
+                return finish(result)
+            # 锁文件每个包一行，不能按默认的输出尾部截断
+            exported = timed("导出锁文件", f"conda list --explicit --md5 -n {shlex.quote(target)}",
+                             tail_lines=100000)
+            if exported["returncode"] == 0 and "@EXPLICIT" in exported["stdout"] \
+                    and not exported["truncated"]:
+                CONDA_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+                tmp = lock.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_text(exported["stdout"], encoding="utf-8")
+                os.replace(tmp, lock)
+    if clone:
+        result = timed("克隆", f"conda create -y -n {shlex.quote(name)} --clone {shlex.quote(target)}")
+    return finish(result)
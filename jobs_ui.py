@@ -0,0 +1,82 @@
+"""页面共用的后台任务界面：提交、任务列表、取消"""
+import re
+import time
+import uuid
+
+import streamlit as st
+
+from command_runner import JobLimitError, get_scheduler
+
+# 任务列表自动刷新间隔(秒)
+JOB_REFRESH_SECONDS = 2
+# sid 会被用作文件名的一部分，只接受 uuid4().hex 生成的格式
+_SID = re.compile(r"[0-9a-f]{32}")
+
+STATUS_LABELS = {
+    "queued": "⏳ 排队中",
+    "running": "🚀 运行中",
+    "done": "✅ 已完成",
+    "failed": "❌ 失败",
+    "cancelled": "⛔ 已取消",
+}
+
+def session_id():
+    """浏览器会话标识，刷新页面后凭 URL 参数 sid 找回任务、shell 与历史
+
+    Streamlit 切换页面时会丢掉 URL 参数，所以以 session_state 中的值为准，
+    缺失时再写回 URL。sid 是访问该会话 shell 的唯一凭据，分享带 sid 的
+    链接等于共享这个 shell。格式不对的 sid 被忽略并换成新生成的。
+    """
+    sid = st.session_state.get("sid") or st.query_params.get("sid")
+    if not sid or not _SID.fullmatch(sid):
+        sid = uuid.uuid4().hex
+    st.session_state["sid"] = sid
+    if st.query_params.get("sid") != sid:
+        st.query_params["sid"] = sid
+    return sid
+
+def submit_job(command, run, heavy=None):
+    """提交后台任务，run(on_output, cancel) 执行命令；超出会话上限时显示错误"""
+    try:
+        job = get_scheduler().submit(session_id(), command, run, heavy)
+    except JobLimitError as e:
+        st.error(str(e))
+        return None
+    st.toast(f"已提交后台任务 {job.id}")
+    return job
+
+def _format_elapsed(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+def _job_list():
+    scheduler = get_scheduler()
+    jobs = scheduler.jobs(session_id())
+    if not jobs:
+        st.caption("暂无后台任务")
+        return
+    for job in jobs:
+        label = f"{STATUS_LABELS[job.status]} `{job.command}` · {_format_elapsed(job.elapsed())}"
+        with st.expander(label, expanded=job.status == "running"):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.caption(f"任务 {job.id}{' · 重任务' if job.heavy else ''} · "
+                           f"提交于 {time.strftime('%H:%M:%S', time.localtime(job.submitted))}")
+            with col2:
+                if job.active:
+                    st.button("取消", key=f"cancel_{job.id}", on_click=scheduler.cancel, args=(job.id,))
+            result = job.result or {}
+            if result.get("error"):
+                st.error(result["error"])
+            if job.stdout:
+                st.code(job.stdout, language="bash")
+            if job.stderr:
+                st.code(job.stderr, language="bash")
+            if result.get("log_file"):
+                st.caption(f"返回代码 {result.get('returncode')}；完整日志：`{result['log_file']}`")
+
+def job_panel():
+    """显示当前会话的后台任务，有未结束的任务时自动刷新"""
+    active = any(job.active for job in get_scheduler().jobs(session_id()))
+    st.subheader("后台任务")
+    st.fragment(_job_list, run_every=JOB_REFRESH_SECONDS if active else None)()
@@ -1,8 +1,12 @@
 import streamlit as st
 import subprocess
 import os
-import requests
+import time
 from pathlib import Path
+from artifact_cache import download_artifact, fetch_checksum
+from command_runner import ShellRegistry, SHELL_IDLE_TIMEOUT, execute
+from jobs_ui import job_panel, session_id, submit_job
+from command_history import get_history, history_panel
 
 # 设置页面标题和图标
 st.set_page_config(
@@ -11,6 +15,15 @@ st.set_page_config(
     layout="centered"
 )
 
+# Miniforge 安装脚本的下载地址(可换成镜像)与可选的 SHA-256；
+# 未指定校验值时使用镜像上的 <安装脚本>.sha256
+MINIFORGE_MIRROR = os.environ.get(
+    "MINIFORGE_MIRROR",
+    "https://github.com/conda-forge/miniforge/releases/latest/download"
+).rstrip("/")
+MINIFORGE_INSTALLER = "Miniforge3-Linux-x86_64.sh"
+MINIFORGE_SHA256 = os.environ.get("MINIFORGE_SHA256")
+
 def install_miniforge():
     """安装Miniforge3到用户目录并初始化conda"""
     home = Path.home()
@@ -19,19 +32,26 @@ def install_miniforge():
     
     if not (conda_bin / "conda").exists():
         try:
-            # 下载Miniforge安装脚本
+            # 下载Miniforge安装脚本（制品缓存中已有时直接复用，中断后续传）
             st.info("🚀 开始下载Miniforge3...")
-            url = "https://github.com/conda-forge/miniforge/releases/latest/download/Miniforge3-Linux-x86_64.sh"
-            response = requests.get(url, timeout=300)
-            response.raise_for_status()
+            url = f"{MINIFORGE_MIRROR}/{MINIFORGE_INSTALLER}"
+            sha256 = MINIFORGE_SHA256 or fetch_checksum(url)
+            if sha256 is None:
+                st.warning("未找到安装脚本的SHA-256，跳过校验")
+            progress = st.progress(0.0)
+            
+            def show_progress(done, total):
+                if total:
+                    progress.progress(done / total, text=f"{done / 2**20:.1f} / {total / 2**20:.1f} MB")
+                else:
+                    progress.progress(0.0, text=f"{done / 2**20:.1f} MB")
             
-            with open("miniforge_installer.sh", "wb") as f:
-                f.write(response.content)
-            os.chmod("miniforge_installer.sh", 0o755)
+            installer = download_artifact(url, sha256=sha256, on_progress=show_progress)
+            progress.progress(1.0, text=f"安装脚本：{installer}")
             
             # 静默安装到用户目录
             st.info("🛠️ 正在安装Miniforge3...（这可能需要3-5分钟）")
-            install_cmd = f"bash miniforge_installer.sh -b -p {miniforge_path}"
+            install_cmd = f"bash {installer} -b -p {miniforge_path}"
             subprocess.run(install_cmd, 
                         shell=True,
                         check=True,
@@ -59,27 +79,66 @@ def install_miniforge():
     else:
         st.session_state.conda_ready = True
 
-def execute_command(command):
-    """执行命令并返回输出（支持conda环境切换）"""
+@st.cache_resource
+def get_shell_registry():
+    """进程内共享的 shell 注册表，每个浏览器会话对应一个持久 bash"""
+    return ShellRegistry()
+
+def execute_command(command, on_output=None):
+    """在当前会话的持久shell中执行命令（支持conda环境切换）
+
+    cd、conda activate、export 等状态在命令之间保留；输出逐行流式读取，
+    on_output(stdout, stderr) 用于实时刷新界面。伪终端合并了标准输出与
+    错误输出，内存中只保留输出尾部，完整输出见返回值中的 log_file。
+    conda list、pip list 等只读命令可能直接返回缓存结果。
+    """
     try:
-        # 使用交互式shell确保加载conda配置
-        result = subprocess.run(
-            ["bash", "-i", "-c", command],
-            capture_output=True,
-            text=True,
-            env=os.environ,
-            timeout=300
-        )
-        return {
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "returncode": result.returncode
-        }
-    except subprocess.TimeoutExpired:
-        return {"error": "命令执行超时（超过5分钟）"}
+        shell = get_shell_registry().get(session_id(), env=os.environ.copy())
+        return execute(command, on_output=on_output, timeout=300, shell=shell, cache=True)
     except Exception as e:
         return {"error": str(e)}
 
+def shell_controls():
+    """显示当前shell状态，并允许重启"""
+    registry = get_shell_registry()
+    shell = registry.peek(session_id())
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        if shell and shell.alive():
+            st.caption(f"Shell PID {shell.pid}，空闲 {SHELL_IDLE_TIMEOUT / 60:.0f} 分钟后自动关闭")
+        else:
+            st.caption("Shell 将在执行第一条命令时启动")
+    with col2:
+        if st.button("重启Shell", disabled=shell is None):
+            registry.close(session_id())
+            st.rerun()
+
+def submit_background(command):
+    """作为后台任务执行：新开一个 bash，工作目录沿用当前会话shell的目录
+
+    后台任务不受300秒限制，也不占用会话shell；但不继承 conda activate、
+    export 等shell内状态。
+    """
+    shell = get_shell_registry().peek(session_id())
+    cwd = None
+    if shell and shell.alive():
+        try:
+            cwd = os.readlink(f"/proc/{shell.pid}/cwd")
+        except OSError:
+            pass
+
+    def run(on_output, cancel):
+        return execute(
+            command,
+            on_output=on_output,
+            cancel=cancel,
+            env=os.environ,
+            cwd=cwd,
+            interactive=True
+        )
+
+    submit_job(command, run)
+
 # 主程序
 def main():
     st.title("☁️ Cloud Terminal Pro")
@@ -87,35 +146,43 @@ def main():
     ### 支持功能：
     - ✅ 完整的conda环境管理
     - ✅ 实时命令执行反馈
-    - ✅ 环境切换持久化
+    - ✅ 环境切换持久化（每个会话一个持久shell）
     - ✅ Jupyter内核管理
     """)
     
-    # 初始化session状态
-    if "history" not in st.session_state:
-        st.session_state.history = []
+    # 命令历史保存在磁盘上，session状态中只有索引
+    history = get_history("terminal")
     
     # 安装Miniforge3
     with st.status("准备运行环境...", expanded=True) as status:
         install_miniforge()
         status.update(label="环境准备就绪", state="complete", expanded=False)
     
+    shell_controls()
+    
     # 命令输入框
+    background = st.toggle("后台运行", help="长时间运行的命令（如conda安装）作为后台任务执行，刷新页面后仍可查看")
     command = st.chat_input("输入Linux/conda命令（例如：conda activate base）", key="cmd_input")
     
-    if command:
+    if command and background:
+        submit_background(command)
+    elif command:
         # 执行命令
         with st.spinner("🚀 执行命令中..."):
-            output = execute_command(command)
+            live = st.empty()
+
+            def show_live(stdout, stderr):
+                with live.container():
+                    st.code(stdout or stderr, language="bash")
+
+            output = execute_command(command, on_output=show_live)
+            live.empty()
         
         # 记录历史
-        st.session_state.history.append({
-            "command": command,
-            "output": output
-        })
+        history.append(command, output)
         
         # 显示最新结果
-        latest = st.session_state.history[-1]
+        latest = {"command": command, "output": output}
         
         with st.expander(f"📝 命令: `{latest['command']}`", expanded=True):
             col1, col2 = st.columns([3, 1])
@@ -124,20 +191,31 @@ def main():
                 if latest['output'].get("error"):
                     st.error(f"❌ 系统错误: {latest['output']['error']}")
                 
-                if latest['output']["stderr"]:
+                if latest['output'].get("cached_at"):
+                    st.caption(f"缓存结果（{time.time() - latest['output']['cached_at']:.0f}秒前执行）")
+                
+                if latest['output'].get("truncated"):
+                    st.caption(f"输出过长，仅显示末尾部分；完整日志：`{latest['output']['log_file']}`")
+                
+                if latest['output'].get("stderr"):
                     st.error("📛 错误输出")
                     st.code(latest['output']["stderr"], language="bash")
                 
-                if latest['output']["stdout"]:
+                if latest['output'].get("stdout"):
                     st.success("📄 标准输出")
                     st.code(latest['output']["stdout"], language="bash")
             
             with col2:
-                st.metric("返回代码", latest['output']['returncode'])
-                if latest['output']['returncode'] == 0:
+                st.metric("返回代码", latest['output'].get('returncode', "N/A"))
+                if latest['output'].get('returncode') == 0:
                     st.success("执行成功")
                 else:
                     st.error("执行失败")
+    
+    with st.expander(f"📜 命令历史（{len(history)}）"):
+        history_panel(history, "terminal_history")
+    
+    job_panel()
 
 if __name__ == "__main__":
     main()
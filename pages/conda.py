@@ -1,21 +1,44 @@
+import time
+from pathlib import Path
 import streamlit as st
-import subprocess
+from command_runner import execute
+from conda_envs import create_environment, file_plan, parse_create_command
+from jobs_ui import job_panel, submit_job
 
 st.set_page_config(page_title="云端命令行工具", page_icon="💻")
 
-def run_command(command):
-    try:
-        process = subprocess.run(
-            command,
-            shell=True,
-            executable="/bin/bash",
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return process.stdout, None
-    except subprocess.CalledProcessError as e:
-        return e.stdout, e.stderr
+ENVIRONMENT_FILE = Path(__file__).with_name("environment.yml")
+
+def execute_command(command, on_output=None, cancel=None, clone=False, force_solve=False):
+    """conda create / conda env create 走锁文件缓存，其他命令直接执行
+
+    conda env list、conda list 等只读命令的结果会被短时间缓存。
+    """
+    plan = parse_create_command(command)
+    if plan is not None:
+        return create_environment(plan, clone=clone, force_solve=force_solve,
+                                  on_output=on_output, cancel=cancel)
+    return execute(command, on_output=on_output, cancel=cancel, cache=True)
+
+def run_command(command, on_output=None, **options):
+    """逐行流式执行命令，返回 (stdout, stderr, 结果)；成功时 stderr 为 None"""
+    result = execute_command(command, on_output=on_output, **options)
+    if result["returncode"] == 0:
+        return result["stdout"], None, result
+    stderr = result["stderr"] or result.get("error") or f"返回代码 {result['returncode']}"
+    return result["stdout"], stderr, result
+
+def show_timings(result):
+    """显示环境创建各阶段耗时与锁文件"""
+    if "timings" not in result:
+        return
+    cols = st.columns(len(result["timings"]) or 1)
+    for col, (phase, seconds) in zip(cols, result["timings"]):
+        col.metric(phase, f"{seconds:.1f} 秒")
+    if result["lock_hit"]:
+        st.caption(f"命中锁文件，跳过求解：`{result['lock_file']}`")
+    else:
+        st.caption(f"已求解并记录锁文件：`{result['lock_file']}`")
 
 # 界面布局
 st.title("云端命令行终端")
@@ -38,11 +61,29 @@ conda install numpy pandas -y
 pip install requests
 """)
 
+# 环境创建选项同时作用于下方命令和 environment.yml，放在表单外以便两处都能读取
+col1, col2 = st.columns(2)
+clone = col1.checkbox("创建环境时从模板克隆", help="同一规格的环境只求解并安装一次作为模板，之后用硬链接克隆")
+force_solve = col2.checkbox("忽略锁文件重新求解", help="包版本需要更新时使用，会覆盖已记录的锁文件")
+options = {"clone": clone, "force_solve": force_solve}
+
 # 命令行输入
-command = st.text_input("输入命令", key="cmd_input",
-                        placeholder="输入要执行的命令...")
+# 输入框与后台选项放在表单中，只有点击执行或回车提交时才重新运行并执行命令
+with st.form("command_form", border=False):
+    command = st.text_input("输入命令", key="cmd_input",
+                            placeholder="输入要执行的命令...")
 
-if st.button("执行") or command:
+    background = st.checkbox("后台运行", help="作为后台任务执行，适合耗时的 conda create/install，刷新页面后仍可查看")
+    clicked = st.form_submit_button("执行")
+
+if background:
+    if clicked and command:
+        submit_job(command, lambda on_output, cancel: execute_command(
+            command, on_output=on_output, cancel=cancel, **options
+        ))
+    elif clicked:
+        st.warning("请输入命令")
+elif clicked:
     if not command:
         st.warning("请输入命令")
         st.stop()
@@ -51,7 +92,13 @@ if st.button("执行") or command:
     st.subheader("执行结果")
     
     with st.status("执行中...", expanded=True) as status:
-        stdout, stderr = run_command(command)
+        live = st.empty()
+        stdout, stderr, result = run_command(
+            command,
+            on_output=lambda out, err: live.code(out or err, line_numbers=True),
+            **options
+        )
+        live.empty()
         
         if stderr:
             status.update(label="执行失败 ❌", state="error")
@@ -61,7 +108,36 @@ if st.button("执行") or command:
         
         if stdout:
             st.code(stdout, line_numbers=True)
+        show_timings(result)
+        if result.get("cached_at"):
+            st.caption(f"缓存结果（{time.time() - result['cached_at']:.0f}秒前执行）")
+        if result.get("log_file"):
+            st.caption(f"完整输出日志：`{result['log_file']}`")
 
     if "conda activate" in command:
         st.info("激活环境后，需在后续命令前添加 'conda run -n 环境名'")
-    
\ No newline at end of file
+
+with st.expander("从 environment.yml 创建环境"):
+    plan = file_plan(ENVIRONMENT_FILE)
+    if plan is None:
+        st.info("environment.yml 含 pip 依赖，请在上方直接执行 conda env create")
+    else:
+        st.code(ENVIRONMENT_FILE.read_text(encoding="utf-8"), language="yaml")
+        plan["name"] = st.text_input("环境名", value=plan["name"] or "streamlit-app")
+        if st.button("创建环境"):
+            with st.status("创建环境中...", expanded=True) as status:
+                live = st.empty()
+                result = create_environment(
+                    plan,
+                    on_output=lambda out, err: live.code(out or err, line_numbers=True),
+                    **options
+                )
+                live.empty()
+                if result["returncode"] == 0:
+                    status.update(label="创建成功 ✅", state="complete")
+                else:
+                    status.update(label="创建失败 ❌", state="error")
+                    st.error(result["stderr"] or result.get("error") or f"返回代码 {result['returncode']}")
+                show_timings(result)
+
+job_panel()
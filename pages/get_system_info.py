@@ -4,91 +4,365 @@ import platform
 import sys
 import re
 import requests
+import numpy as np
+import pandas as pd
 from socket import gethostname, gethostbyname
 import os
 import time
+import glob
+import json
+import hashlib
+import gzip
+import html
+import threading
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from importlib import metadata
 from pathlib import Path
 
-def get_system_info():
-    """获取系统级信息，包含IP地址"""
+# dpkg 状态数据库路径
+DPKG_STATUS = "/var/lib/dpkg/status"
+# 每页显示的软件包数量，扫描时凑满一页即先行预览
+PAGE_SIZE = 25
+# 扫描进度提示的最小刷新间隔(秒)，避免每解析一页就重绘
+PREVIEW_INTERVAL = 0.3
+# 软件清单磁盘缓存目录，所有会话共享
+INVENTORY_CACHE_DIR = Path(os.environ.get(
+    "INVENTORY_CACHE_DIR",
+    Path.home() / ".cache" / "components_example" / "inventory",
+))
+# 软件清单快照目录，可放入从其他主机导出的快照文件
+SNAPSHOT_DIR = Path(os.environ.get(
+    "INVENTORY_SNAPSHOT_DIR",
+    Path.home() / ".cache" / "components_example" / "snapshots",
+))
+# 公网IP查询接口(返回 {"ip": ...} 的JSON或纯文本)，置空则不查询；结果缓存时长(秒)
+PUBLIC_IP_ENDPOINT = os.environ.get("PUBLIC_IP_ENDPOINT", "https://api.ipify.org?format=json")
+PUBLIC_IP_TTL = float(os.environ.get("PUBLIC_IP_TTL", "600"))
+# 查询失败时的重试间隔(秒)，避免每次访问都重新请求不可达的接口
+PUBLIC_IP_RETRY = 60
+# 信息采集线程池大小(不少于采集项个数)及各采集项的超时时间(秒)
+COLLECTOR_WORKERS = 4
+COLLECTOR_TIMEOUTS = {
+    "filesystem": 15,
+    "os": 5,
+    "network": 5,
+    "python": 60,
+}
+# 目录扫描限制：最大深度、总条目预算、单个目录最多读取的条目数
+SCAN_MAX_DEPTH = 3
+SCAN_ENTRY_BUDGET = 2000
+SCAN_DIR_LIMIT = 300
+# 目录列表缓存最多保存的目录数
+DIR_CACHE_SIZE = 1024
+
+def get_os_info():
+    """获取操作系统基础信息"""
     try:
-        # 获取基础系统信息
-        os_info = {
+        return {
             "System": platform.system(),
             "Release": platform.release(),
             "Version": platform.version(),
             "Machine": platform.machine(),
             "Hostname": gethostname()
         }
+    except Exception as e:
+        return {"Error": str(e)}
+
+class IPLookup:
+    """进程级缓存的内网/公网IP，过期后在后台线程刷新，读取永不阻塞"""
 
-        # 获取IP地址信息
+    def __init__(self, endpoint=PUBLIC_IP_ENDPOINT, ttl=PUBLIC_IP_TTL):
+        self.endpoint = endpoint
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._info = {"Internal IP": "获取中...", "Public IP": "获取中..." if endpoint else "未启用"}
+        self._expires = 0.0
+        self._updated = None
+        self._refreshing = False
+
+    def _fetch_public_ip(self):
+        response = requests.get(self.endpoint, timeout=3)
+        if response.status_code != 200:
+            return "获取失败", False
         try:
-            # 获取内网IP
-            os_info["Internal IP"] = gethostbyname(gethostname())
-            
-            # 获取公网IP
-            ip_response = requests.get('https://api.ipify.org?format=json', timeout=3)
-            if ip_response.status_code == 200:
-                os_info["Public IP"] = ip_response.json()["ip"]
-            else:
-                os_info["Public IP"] = "获取失败"
-        except Exception as ip_error:
-            os_info["Public IP"] = f"获取错误: {str(ip_error)}"
+            return response.json()["ip"], True
+        except ValueError:
+            return response.text.strip(), True
 
-        return os_info
-    except Exception as e:
-        return {"Error": str(e)}
+    def _refresh(self):
+        info, ok = {}, True
+        try:
+            info["Internal IP"] = gethostbyname(gethostname())
+        except Exception as e:
+            info["Internal IP"] = f"获取错误: {str(e)}"
+        if self.endpoint:
+            try:
+                info["Public IP"], ok = self._fetch_public_ip()
+            except Exception as ip_error:
+                info["Public IP"], ok = f"获取错误: {str(ip_error)}", False
+        with self._lock:
+            self._info.update(info)
+            self._updated = time.time()
+            self._expires = time.monotonic() + (self.ttl if ok else PUBLIC_IP_RETRY)
+            self._refreshing = False
+
+    def get(self):
+        """立即返回缓存值(含 Updated 时间)，过期时触发一次后台刷新"""
+        with self._lock:
+            if time.monotonic() >= self._expires and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name="ip-lookup", daemon=True).start()
+            info = dict(self._info)
+            info["Updated"] = (time.strftime("%H:%M:%S", time.localtime(self._updated))
+                               if self._updated else "尚未完成")
+        return info
+
+@st.cache_resource
+def get_ip_lookup():
+    return IPLookup()
+
+def get_network_info(lookup=None):
+    """获取内网与公网IP地址(读取缓存，不等待网络请求)
+
+    在采集线程中调用时需显式传入 lookup。
+    """
+    return {"Hostname": gethostname(), **(lookup or get_ip_lookup()).get()}
+
+class CollectorPool:
+    """有界线程池，同名同参数的采集同一时间只运行一个
+
+    超时的采集无法中断，线程要等它自己结束才释放。同名同参数的采集在上一次
+    结束前不会重复提交，而是复用仍在运行的那一次，所以卡住的采集(例如失效的
+    挂载点)最多占用一个线程，不会随页面访问次数累积占满线程池。参数不同
+    (如是否统计大小、是否忽略缓存)的请求不会拿到别人的结果。
+    """
+
+    def __init__(self, workers=COLLECTOR_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="collector")
+        self._lock = threading.Lock()
+        self._running = {}
+
+    def submit(self, name, func, *args):
+        """在线程池中执行 func(*args)，以 (name, *args) 识别同一采集"""
+        key = (name, *args)
+        with self._lock:
+            future = self._running.get(key)
+            if future is None or future.done():
+                future = self._running[key] = self._executor.submit(_timed, lambda: func(*args))
+            return future
+
+@st.cache_resource
+def get_collector_pool():
+    """进程内共享的采集线程池，不阻塞页面渲染"""
+    return CollectorPool()
+
+def _timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+def run_collectors(collectors, render):
+    """并发执行各采集函数，任一完成即调用 render(name, result, elapsed, error)
+
+    collectors 为 {name: (func, *args)}，超时时间取自 COLLECTOR_TIMEOUTS；超时
+    的采集以 error="超时" 渲染，不等待其结束。上一次同名同参数的采集仍在
+    运行时直接等待它的结果，见 CollectorPool。
+    """
+    pool = get_collector_pool()
+    started = time.monotonic()
+    futures = {pool.submit(name, *call): name for name, call in collectors.items()}
+    deadlines = {name: started + COLLECTOR_TIMEOUTS.get(name, 10) for name in collectors}
+    pending = set(futures)
+    while pending:
+        next_deadline = min(deadlines[futures[f]] for f in pending)
+        done, pending = wait(
+            pending,
+            timeout=max(0.0, next_deadline - time.monotonic()),
+            return_when=FIRST_COMPLETED,
+        )
+        for future in done:
+            name = futures[future]
+            try:
+                result, elapsed = future.result()
+                render(name, result, elapsed, None)
+            except Exception as e:
+                render(name, None, time.monotonic() - started, str(e))
+        now = time.monotonic()
+        for future in [f for f in pending if deadlines[futures[f]] <= now]:
+            pending.discard(future)
+            name = futures[future]
+            render(name, None, COLLECTOR_TIMEOUTS.get(name, 10), "超时")
+
+class DirectoryCache:
+    """以目录 mtime 为校验的目录列表 LRU 缓存，进程内所有会话共享
+
+    目录 mtime 只在增删/重命名条目时改变，文件大小变化不会使缓存失效。
+    """
+
+    def __init__(self, max_size=DIR_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> (mtime_ns, entries, truncated)
+
+    def list(self, path, limit=SCAN_DIR_LIMIT):
+        """返回 ([(name, is_dir, size), ...], 是否截断)"""
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached and cached[0] == mtime:
+                self._entries.move_to_end(path)
+                return cached[1], cached[2]
+
+        entries, truncated = [], False
+        with os.scandir(path) as it:
+            for entry in it:
+                if len(entries) >= limit:
+                    truncated = True
+                    break
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    size = 0 if is_dir else entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    is_dir, size = False, None
+                entries.append((entry.name, is_dir, size))
+        entries.sort(key=lambda item: (not item[1], item[0].lower()))
+
+        with self._lock:
+            self._entries[path] = (mtime, entries, truncated)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entries, truncated
+
+@st.cache_resource
+def get_directory_cache():
+    return DirectoryCache()
+
+def scan_directory(root, max_depth=SCAN_MAX_DEPTH, budget=SCAN_ENTRY_BUDGET, compute_sizes=False,
+                   cache=None):
+    """基于 os.scandir 的广度优先迭代扫描，返回根节点
+
+    节点为 {name, path, is_dir, size, children, truncated, error}。超过
+    max_depth 或条目预算耗尽的目录 children 为 None(未展开)，可以之后
+    以该目录为 root 再次调用按需展开。compute_sizes 时目录 size 为其已
+    扫描部分的文件大小合计。在采集线程中调用时需显式传入 cache。
+    """
+    def make_node(name, path, is_dir, size):
+        return {"name": name, "path": path, "is_dir": is_dir, "size": size,
+                "children": None, "truncated": False, "error": None}
+
+    root = str(root)
+    root_node = make_node(os.path.basename(root.rstrip(os.sep)) or root, root, True, None)
+    cache = cache or get_directory_cache()
+    queue = deque([(root_node, 0)])
+    expanded = []
+    remaining = budget
+    while queue:
+        node, depth = queue.popleft()
+        if depth >= max_depth or remaining <= 0:
+            continue
+        try:
+            entries, truncated = cache.list(node["path"])
+        except OSError as e:
+            node["error"] = str(e)
+            continue
+        children = []
+        for name, is_dir, size in entries[:remaining]:
+            child = make_node(name, os.path.join(node["path"], name), is_dir, None if is_dir else size)
+            children.append(child)
+            if is_dir:
+                queue.append((child, depth + 1))
+        remaining -= len(children)
+        node["children"] = children
+        node["truncated"] = truncated or len(entries) > len(children)
+        expanded.append(node)
+
+    if compute_sizes:
+        # 广度优先顺序倒序处理，保证子目录先于父目录完成汇总
+        for node in reversed(expanded):
+            node["size"] = sum(child["size"] or 0 for child in node["children"])
+    return root_node
 
-def get_filesystem_info():
+def get_filesystem_info(compute_sizes=False, cache=None):
     """获取文件系统结构信息"""
     try:
         # 获取当前工作目录
         current_path = Path.cwd()
         
-        # 获取文件系统结构（限制3层深度）
-        fs_structure = {}
-        def scan_directory(path, depth=0):
-            if depth > 2:  # 控制扫描深度
-                return {}
-            structure = {}
-            try:
-                for entry in path.iterdir():
-                    if entry.is_dir():
-                        structure[entry.name + '/'] = scan_directory(entry, depth+1)
-                    else:
-                        structure[entry.name] = "file"
-            except Exception as e:
-                structure[f"⚠️访问错误({str(e)})"] = {}
-            return structure
-        
         # 获取文件列表详细信息
         file_list = []
-        for item in current_path.iterdir():
-            try:
-                stat = item.stat()
-                file_list.append({
-                    "name": item.name + ('/' if item.is_dir() else ''),
-                    "size": f"{stat.st_size/1024:.1f}KB",
-                    "modified": time.strftime('%Y-%m-%d %H:%M', 
-                                   time.localtime(stat.st_mtime)),
-                    "type": "目录" if item.is_dir() else "文件"
-                })
-            except Exception as e:
-                file_list.append({
-                    "name": f"⚠️{item.name}",
-                    "size": "N/A",
-                    "modified": "访问错误",
-                    "type": str(e)
-                })
+        with os.scandir(current_path) as it:
+            for item in it:
+                try:
+                    is_dir = item.is_dir()
+                    stat = item.stat()
+                    file_list.append({
+                        "name": item.name + ('/' if is_dir else ''),
+                        "size": f"{stat.st_size/1024:.1f}KB",
+                        "modified": time.strftime('%Y-%m-%d %H:%M', 
+                                       time.localtime(stat.st_mtime)),
+                        "type": "目录" if is_dir else "文件"
+                    })
+                except Exception as e:
+                    file_list.append({
+                        "name": f"⚠️{item.name}",
+                        "size": "N/A",
+                        "modified": "访问错误",
+                        "type": str(e)
+                    })
         
         return {
             "current_path": str(current_path),
-            "structure": scan_directory(current_path.parent),  # 显示上级目录结构
+            # 显示上级目录结构（限制深度与条目数）
+            "structure": scan_directory(current_path.parent, compute_sizes=compute_sizes, cache=cache),
             "files": file_list
         }
     except Exception as e:
         return {"Error": f"文件系统扫描失败: {str(e)}"}
 
+TREE_STYLE = """
+<style>
+.fs-tree {font-size: 0.9em; line-height: 1.6;}
+.fs-tree details > :not(summary) {margin-left: 1.2em;}
+.fs-tree summary {cursor: pointer;}
+</style>
+"""
+
+def tree_html(root):
+    """把目录树一次性拼成嵌套 <details> 的HTML
+
+    整棵树作为单个 Streamlit 元素发送，折叠由浏览器原生处理，
+    不再为每个文件/目录生成一个元素。
+    """
+    parts = [TREE_STYLE, '<div class="fs-tree">']
+
+    def label(node):
+        size = f" ({node['size']/1024:.1f}KB)" if node["size"] is not None else ""
+        if not node["is_dir"]:
+            return f"📄 {html.escape(node['name'])}{size}"
+        pending = " (未展开)" if node["children"] is None and not node["error"] else ""
+        return f"📁 {html.escape(node['name'])}/{size}{pending}"
+
+    def add_children(node):
+        for child in node["children"] or []:
+            if child["is_dir"] and (child["children"] or child["error"] or child["truncated"]):
+                parts.append(f"<details><summary>{label(child)}</summary>")
+                add_children(child)
+                parts.append("</details>")
+            else:
+                parts.append(f"<div>{label(child)}</div>")
+        if node["error"]:
+            parts.append(f"<div>⚠️访问错误({html.escape(node['error'])})</div>")
+        if node["truncated"]:
+            parts.append("<div>⋯ 条目过多，已截断</div>")
+
+    add_children(root)
+    parts.append("</div>")
+    return "".join(parts)
+
 def display_filesystem_info(fs_info):
     """显示文件系统信息"""
     if "Error" in fs_info:
@@ -100,14 +374,20 @@ def display_filesystem_info(fs_info):
     with cols[0]:
         st.markdown("**目录结构**")
         with st.container(height=300):
-            def print_structure(structure, indent=0):
-                for name, contents in structure.items():
-                    st.markdown(f"{'&nbsp;'*indent*4}📁 {name}" if name.endswith('/') else 
-                               f"{'&nbsp;'*indent*4}📄 {name}")
-                    if isinstance(contents, dict):
-                        print_structure(contents, indent+1)
-            
-            print_structure(fs_info["structure"])
+            st.markdown(tree_html(fs_info["structure"]), unsafe_allow_html=True)
+
+        # 未展开或被截断的目录可按需单独扫描
+        def collapsed(node):
+            for child in node["children"] or []:
+                if child["is_dir"] and (child["children"] is None or child["truncated"]) and not child["error"]:
+                    yield child["path"]
+                yield from collapsed(child)
+
+        target = st.selectbox("展开目录", [""] + list(collapsed(fs_info["structure"])), key="expand_dir")
+        if target:
+            expanded = scan_directory(target)
+            with st.container(height=200):
+                st.markdown(tree_html(expanded), unsafe_allow_html=True)
     
     with cols[1]:
         st.markdown(f"**当前路径：** `{fs_info['current_path']}`")
@@ -128,39 +408,122 @@ def display_filesystem_info(fs_info):
 def display_system_info():
     """显示增强后的系统信息"""
     with st.expander("📋 系统基本信息", expanded=True):
-        sys_info = get_system_info()
-        fs_info = get_filesystem_info()
-        
-        # 三栏布局
+        compute_sizes = st.checkbox("汇总目录大小", key="compute_dir_sizes")
+        dir_cache = get_directory_cache()
+        ip_lookup = get_ip_lookup()
+        # 三栏布局，各栏先占位，哪个采集先完成就先渲染哪个
         info_cols = st.columns([3, 2, 2])
+        titles = {"filesystem": "**文件系统**", "os": "**操作系统信息**", "network": "**网络信息**"}
+        placeholders = {}
+        for col, name in zip(info_cols, titles):
+            with col:
+                st.markdown(titles[name])
+                placeholders[name] = st.empty()
+                placeholders[name].info("加载中...")
+
+        def render(name, result, elapsed, error):
+            with placeholders[name].container():
+                if error:
+                    st.error(f"采集失败: {error}")
+                elif name == "filesystem":
+                    display_filesystem_info(result)
+                elif name == "os":
+                    st.json({
+                        "系统类型": result.get("System", "N/A"),
+                        "发行版本": result.get("Release", "N/A"),
+                        "系统版本": result.get("Version", "N/A")
+                    })
+                else:
+                    st.json({
+                        "主机名": result.get("Hostname", "N/A"),
+                        "内网IP": result.get("Internal IP", "N/A"),
+                        "公网IP": result.get("Public IP", "N/A"),
+                        "更新时间": result.get("Updated", "N/A")
+                    })
+                st.caption(f"⏱️ {elapsed * 1000:.0f} ms")
+
+        run_collectors(
+            {"filesystem": (get_filesystem_info, compute_sizes, dir_cache), "os": (get_os_info,),
+             "network": (get_network_info, ip_lookup)},
+            render,
+        )
 
-        with info_cols[0]:
-            st.markdown("**文件系统**")
-            display_filesystem_info(fs_info)    
-
-        with info_cols[1]:
-            st.markdown("**操作系统信息**")
-            st.json({
-                "系统类型": sys_info.get("System", "N/A"),
-                "发行版本": sys_info.get("Release", "N/A"),
-                "系统版本": sys_info.get("Version", "N/A")
-            })     
-
-        with info_cols[2]:
-            st.markdown("**网络信息**")
-            st.json({
-                "主机名": sys_info.get("Hostname", "N/A"),
-                "内网IP": sys_info.get("Internal IP", "N/A"),
-                "公网IP": sys_info.get("Public IP", "N/A")
-            })   
-
-def get_system_packages():
-    """获取系统级安装的软件包"""
+def dpkg_native_architecture():
+    """dpkg 的本机架构(如 amd64)，取不到时返回 None"""
+    try:
+        result = subprocess.run(["dpkg", "--print-architecture"],
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+def iter_dpkg_status(path=DPKG_STATUS, native_arch=None):
+    """逐条解析 dpkg 状态数据库，流式产出已安装软件包
+
+    按行读取、以空行分隔记录，不把整个文件读入内存；每解析完一条
+    已安装的记录就立即 yield (包名, 信息字典)。Installed-Size 字段
+    单位为 KiB，转换为字节存入 size。与 dpkg -l 一样，外来架构
+    (multiarch)的包名写作 名称:架构，如 libc6:i386；native_arch 为本机
+    架构，不知道时(None)同名包第二次出现起写作 名称:架构，结果只取决于
+    文件内容，不依赖运行的主机。
+    """
+    seen = set()
+
+    def parse(record):
+        status = record.get("Status", "").split()
+        if not status or status[-1] != "installed" or "Package" not in record:
+            return None
+        size = record.get("Installed-Size", "")
+        name, arch = record["Package"], record.get("Architecture", "")
+        if native_arch and arch not in ("", "all", native_arch):
+            name = f"{name}:{arch}"
+        elif not native_arch and name in seen and arch:
+            name = f"{name}:{arch}"
+        seen.add(name)
+        return name, {
+            "version": record.get("Version", ""),
+            "architecture": record.get("Architecture", ""),
+            "section": record.get("Section", ""),
+            "size": int(size) * 1024 if size.isdigit() else None,
+            "description": record.get("Description", ""),
+        }
+
+    record = {}
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line == "\n":
+                parsed = parse(record)
+                if parsed:
+                    yield parsed
+                record = {}
+            elif line[0] in " \t":
+                # 多行字段的续行(如 Description 的详细说明)，只保留首行摘要
+                continue
+            else:
+                key, _, value = line.partition(":")
+                record[key] = value.strip()
+    parsed = parse(record)
+    if parsed:
+        yield parsed
+
+def get_system_packages(on_progress=None):
+    """获取系统级安装的软件包
+
+    on_progress(packages) 在流式解析 dpkg 状态数据库时周期性调用，
+    可用于在全部解析完成前先渲染已得到的部分结果。
+    """
     try:
         system = platform.system()
         packages = {}
 
-        if system == "Linux":
+        if system == "Linux" and os.path.exists(DPKG_STATUS):
+            # Debian/Ubuntu：直接解析 dpkg 状态数据库
+            for name, info in iter_dpkg_status(native_arch=dpkg_native_architecture()):
+                packages[name] = info
+                if on_progress and len(packages) % PAGE_SIZE == 0:
+                    on_progress(packages)
+
+        elif system == "Linux":
             # 尝试获取Debian/Ubuntu系软件包
             result = subprocess.run(
                 ["dpkg", "-l"],
@@ -218,26 +581,134 @@ def get_system_packages():
     except Exception as e:
         return {"Error": str(e)}
 
-def get_python_packages():
-    """获取Python安装包信息"""
+def find_python_environments():
+    """查找本机可见的Python环境，返回 {环境名: site-packages目录列表}
+
+    直接扫描 conda 根目录、envs 子目录及 ~/.conda/environments.txt，
+    不启动任何解释器或 conda 进程。
+    """
+    environments = {"当前解释器": None}  # None 表示使用当前 sys.path
+    home = Path.home()
+    roots = [os.environ.get("CONDA_PREFIX"), sys.base_prefix]
+    roots += [str(home / name) for name in ("miniforge3", "miniconda3", "anaconda3")]
+    roots += ["/opt/conda"]
+
+    prefixes = []
+    for root in filter(None, roots):
+        prefixes.append(root)
+        prefixes.extend(sorted(glob.glob(os.path.join(root, "envs", "*"))))
+    env_file = home / ".conda" / "environments.txt"
+    if env_file.exists():
+        prefixes.extend(line.strip() for line in env_file.read_text().splitlines() if line.strip())
+
+    seen = {os.path.realpath(sys.prefix)}
+    for prefix in prefixes:
+        real = os.path.realpath(prefix)
+        if real in seen or not os.path.isdir(real):
+            continue
+        seen.add(real)
+        site_dirs = (glob.glob(os.path.join(real, "lib", "python*", "site-packages"))
+                     + glob.glob(os.path.join(real, "Lib", "site-packages")))
+        if site_dirs:
+            environments[prefix] = site_dirs
+    return environments
+
+def get_python_packages(site_dirs=None):
+    """获取Python安装包信息
+
+    直接读取已安装发行包的元数据(dist-info/egg-info)，不再启动 pip 子进程。
+    site_dirs 为空时枚举当前解释器的 sys.path，否则只枚举给定目录(可属于
+    其他解释器或conda环境)。返回 {包名: {version, location, size}}，
+    size 取自 RECORD 文件记录的字节数，缺少 RECORD 时为 None。
+    """
     try:
-        result = subprocess.run(
-            [sys.executable, "-m", "pip", "list", "--format=freeze"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
         packages = {}
-        for line in result.stdout.split('\n'):
-            if '==' in line:
-                pkg, ver = line.split('==')
-                packages[pkg.strip()] = ver.strip()
+        for dist in metadata.distributions(**({"path": site_dirs} if site_dirs else {})):
+            name = dist.metadata["Name"]
+            # 同名包以搜索路径中靠前的为准，与 import 行为一致
+            if not name or name in packages:
+                continue
+            files = dist.files
+            packages[name] = {
+                "version": dist.version,
+                "location": str(dist.locate_file("")),
+                "size": sum(f.size or 0 for f in files) if files else None,
+            }
         return packages
-    except subprocess.CalledProcessError as e:
-        return {"Error": f"命令执行失败: {e.stderr}"}
     except Exception as e:
         return {"Error": str(e)}
 
+def path_fingerprint(paths):
+    """由路径的 mtime 与大小组成的廉价指纹，任一路径变化即失效"""
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append([str(path), stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            fingerprint.append([str(path), None, None])
+    return fingerprint
+
+def system_fingerprint():
+    """系统软件包来源的指纹；无法廉价判断变化的平台返回 None(不缓存)"""
+    if platform.system() == "Linux" and os.path.exists(DPKG_STATUS):
+        return path_fingerprint([DPKG_STATUS])
+    return None
+
+def python_fingerprint(site_dirs=None):
+    """Python环境的指纹：安装/卸载包会改变 site-packages 目录的 mtime"""
+    if site_dirs is None:
+        site_dirs = [p for p in sys.path
+                     if p.endswith(("site-packages", "dist-packages")) and os.path.isdir(p)]
+    return path_fingerprint(site_dirs)
+
+def load_cached_inventory(name, fingerprint):
+    """读取指纹仍然匹配的缓存清单，不存在或已失效时返回 None"""
+    if fingerprint is None:
+        return None
+    try:
+        cached = json.loads((INVENTORY_CACHE_DIR / f"{name}.json").read_text(encoding="utf-8"))
+        if cached["fingerprint"] == fingerprint:
+            return cached["packages"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def get_inventory(name, fingerprint, scan, force=False):
+    """带磁盘缓存的清单获取，返回 (结果, 是否命中缓存)
+
+    缓存文件按来源分别保存，指纹未变化时直接返回缓存内容，只有发生
+    变化的来源才调用 scan() 重新扫描。扫描出错的结果不写入缓存。
+    """
+    cache_file = INVENTORY_CACHE_DIR / f"{name}.json"
+    cached = None if force else load_cached_inventory(name, fingerprint)
+    if cached is not None:
+        return cached, True
+
+    packages = scan()
+    if fingerprint is not None and "Error" not in packages:
+        try:
+            INVENTORY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp_file.write_text(
+                json.dumps({"fingerprint": fingerprint, "packages": packages}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+    return packages, False
+
+def python_inventory(site_dirs=None, force=False):
+    """带缓存的Python包清单，site_dirs 为 None 时表示当前解释器"""
+    key = "current" if site_dirs is None else hashlib.sha1("\n".join(site_dirs).encode()).hexdigest()[:12]
+    return get_inventory(
+        f"python-{key}",
+        python_fingerprint(site_dirs),
+        lambda: get_python_packages(site_dirs),
+        force=force,
+    )
+
 def display_combined_packages(system_pkgs, python_pkgs):
     """显示合并后的软件包信息"""
     tab1, tab2 = st.tabs(["系统软件", "Python包"])
@@ -250,32 +721,232 @@ def display_combined_packages(system_pkgs, python_pkgs):
             display_package_table(system_pkgs, "system")
     
     with tab2:
+        environments = find_python_environments()
+        env = st.selectbox("Python环境", list(environments), key="python_env")
+        if environments[env] is not None:
+            # 其他环境直接读取其 site-packages 元数据，无需点击全量刷新
+            python_pkgs, _ = python_inventory(environments[env])
         if "Error" in python_pkgs:
             st.error(python_pkgs["Error"])
         else:
             st.subheader(f"Python包 ({len(python_pkgs)}个)")
             display_package_table(python_pkgs, "python")
 
+# 包信息字段与表头的对应关系，缺失的字段不显示
+PACKAGE_FIELDS = {
+    "version": "版本",
+    "architecture": "架构",
+    "section": "分类",
+    "size": "大小",
+    "location": "位置",
+    "description": "描述",
+}
+# 模糊匹配至少需要命中查询中该比例的三元组
+FUZZY_THRESHOLD = 0.5
+# 名称(或其中以 -_.:+ 分隔的片段)与查询的编辑距离不超过该值时视为拼写错误，
+# 相邻字符交换算一次编辑；少于 5 个字符的查询只容许 1 次
+FUZZY_MAX_EDITS = 2
+# 拼写错误索引只对名称前这么多个字符生成删除变体(SymSpell 的前缀长度)
+FUZZY_PREFIX = 7
+PACKAGE_SORT_KEYS = {"相关度": None, "名称": "name", "版本": "version", "大小": "size"}
+
+def package_rows(items):
+    """把 (包名, 版本字符串或信息字典) 转换成表格行"""
+    rows = []
+    for name, info in items:
+        if not isinstance(info, dict):
+            info = {"version": info}
+        row = {"名称": name}
+        for field, label in PACKAGE_FIELDS.items():
+            if field == "size" and field in info:
+                row[label] = f"{info['size'] / 1024:.1f}KB" if info["size"] is not None else "N/A"
+            elif field in info:
+                row[label] = info[field]
+        rows.append(row)
+    return rows
+
+def _trigrams(text, padded=True):
+    if padded:
+        text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _edit_distance(a, b, limit):
+    """含相邻交换的编辑距离(OSA)，超过 limit 时提前返回 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+def _deletions(word, depth):
+    """删除至多 depth 个字符得到的全部变体(含原词)"""
+    variants, frontier = {word}, {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+class PackageIndex:
+    """软件包搜索索引：名称/版本/描述的三元组倒排索引 + 排序用的 DataFrame
+
+    索引在包列表变化时构建一次，之后每次输入只查倒排表、给候选打分，
+    分页时只对当前页的行号取数据，从不生成完整的过滤结果列表。
+    """
+
+    def __init__(self, packages):
+        self.names = list(packages)
+        self.infos = [info if isinstance(info, dict) else {"version": info}
+                      for info in packages.values()]
+        self.frame = pd.DataFrame({
+            "name": [name.lower() for name in self.names],
+            "version": [info.get("version", "") for info in self.infos],
+            "size": [info.get("size") or 0 for info in self.infos],
+            "text": [f"{info.get('version', '')} {info.get('description', '')}".lower()
+                     for info in self.infos],
+        })
+        postings = {}
+        for row, (name, text) in enumerate(zip(self.frame["name"], self.frame["text"])):
+            for gram in _trigrams(name) | _trigrams(text):
+                postings.setdefault(gram, []).append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+        # 名称及其片段 -> 行号，用于拼写错误的匹配
+        self.tokens = {}
+        for row, name in enumerate(self.frame["name"]):
+            for token in {name, *re.split(r"[-_.:+]", name)}:
+                if token:
+                    self.tokens.setdefault(token, []).append(row)
+        # 删除变体 -> 片段：编辑距离不超过 k 的两个词删除至多 k 个字符后必有相同变体，
+        # 查询时只需生成查询自身的变体查表，再对少量候选计算编辑距离
+        self.deletions = {}
+        for token in self.tokens:
+            for variant in _deletions(token[:FUZZY_PREFIX], FUZZY_MAX_EDITS):
+                self.deletions.setdefault(variant, []).append(token)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _count_hits(self, grams):
+        """每行命中给定三元组的个数"""
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return np.zeros(len(self.names), dtype=np.int64)
+        return np.bincount(np.concatenate(hits), minlength=len(self.names))
+
+    def _typo_matches(self, query):
+        """名称或其片段与查询编辑距离在容许范围内的行，返回 {行号: 距离}"""
+        limit = FUZZY_MAX_EDITS if len(query) >= 5 else 1
+        candidates = set()
+        for variant in _deletions(query[:FUZZY_PREFIX], limit):
+            candidates.update(self.deletions.get(variant, ()))
+        matches = {}
+        for token in candidates:
+            distance = _edit_distance(query, token, limit)
+            if distance <= limit:
+                for row in self.tokens[token]:
+                    matches[row] = min(distance, matches.get(row, distance))
+        return matches
+
+    def search(self, query, sort_key=None, ascending=True):
+        """返回按相关度(或指定列)排序的匹配行号数组"""
+        query = query.strip().lower()
+        names, texts = self.frame["name"], self.frame["text"]
+        if not query:
+            candidates = np.arange(len(self.names))
+            scores = np.zeros(len(candidates))
+        else:
+            grams = _trigrams(query)
+            counts = self._count_hits(grams)
+            typos = {}
+            if len(query) < 3:
+                # 过短的查询三元组区分度不够，退化为子串匹配
+                candidates = np.nonzero(names.str.contains(query, regex=False).to_numpy()
+                                        | texts.str.contains(query, regex=False).to_numpy())[0]
+            else:
+                # 子串匹配必然包含查询的全部内部三元组；其余按命中比例做模糊匹配
+                inner = _trigrams(query, padded=False)
+                substring = self._count_hits(inner) == len(inner)
+                # 拼写错误(如 pyhton)与原词共有的三元组很少，另按编辑距离匹配名称
+                typos = self._typo_matches(query)
+                typo = np.zeros(len(self.names), dtype=bool)
+                typo[list(typos)] = True
+                candidates = np.nonzero(substring | typo | (counts >= FUZZY_THRESHOLD * len(grams)))[0]
+            scores = np.empty(len(candidates))
+            for i, row in enumerate(candidates):
+                name = names.iat[row]
+                if name == query:
+                    scores[i] = 1000
+                elif name.startswith(query):
+                    scores[i] = 500 - len(name)
+                elif query in name:
+                    scores[i] = 300 - len(name)
+                elif query in texts.iat[row]:
+                    scores[i] = 100
+                else:
+                    # 模糊匹配：优先看与名称本身的三元组重合度
+                    overlap = len(grams & _trigrams(name)) / len(grams)
+                    scores[i] = overlap * 90 + counts[row] / len(grams) * 10
+                    if row in typos:
+                        scores[i] = max(scores[i], 80 - 10 * typos[row] - len(name) / 10)
+
+        column = PACKAGE_SORT_KEYS.get(sort_key)
+        if column is None:
+            # 相关度降序，同分按名称
+            order = np.lexsort((names.to_numpy()[candidates], -scores))
+        else:
+            order = np.argsort(self.frame[column].to_numpy()[candidates], kind="stable")
+            if not ascending:
+                order = order[::-1]
+        return candidates[order]
+
+    def rows(self, positions):
+        return package_rows((self.names[i], self.infos[i]) for i in positions)
+
+def get_package_index(packages, pkg_type):
+    """按内容签名在会话中复用搜索索引，包列表变化时重建"""
+    signature = hash(tuple(
+        (name, info.get("version") if isinstance(info, dict) else info)
+        for name, info in packages.items()
+    ))
+    cached = st.session_state.get(f"pkg_index_{pkg_type}")
+    if cached is None or cached[0] != signature:
+        cached = (signature, PackageIndex(packages))
+        st.session_state[f"pkg_index_{pkg_type}"] = cached
+    return cached[1]
+
 def display_package_table(packages, pkg_type):
     """通用包信息显示组件（增强版）"""
     if not packages:
         st.warning("没有找到软件包信息")
         return
+    index = get_package_index(packages, pkg_type)
     
-    # 创建搜索框
-    search_term = st.text_input(
-        "输入名称过滤：", 
-        key=f"search_{pkg_type}",
-        placeholder="支持模糊搜索"
-    )
+    # 创建搜索框与排序
+    cols = st.columns([3, 1, 1])
+    with cols[0]:
+        search_term = st.text_input(
+            "搜索：", 
+            key=f"search_{pkg_type}",
+            placeholder="支持模糊搜索名称、版本与描述"
+        )
+    with cols[1]:
+        sort_key = st.selectbox("排序", list(PACKAGE_SORT_KEYS), key=f"sort_{pkg_type}")
+    with cols[2]:
+        ascending = st.toggle("升序", True, key=f"asc_{pkg_type}")
     
-    # 过滤结果
-    filtered = {k:v for k,v in packages.items() if search_term.lower() in k.lower()}
+    # 过滤结果(行号数组)
+    matches = index.search(search_term, sort_key, ascending)
     
     # 分页控制
-    if filtered:
-        PAGE_SIZE = 25
-        total_pages = max(1, (len(filtered) + PAGE_SIZE - 1) // PAGE_SIZE)
+    if len(matches):
+        total_pages = max(1, (len(matches) + PAGE_SIZE - 1) // PAGE_SIZE)
         
         cols = st.columns([2,1,3])
         with cols[1]:
@@ -290,15 +961,165 @@ def display_package_table(packages, pkg_type):
         # 显示分页信息
         start = (page-1)*PAGE_SIZE
         end = start + PAGE_SIZE
-        st.caption(f"显示第 {start+1}-{min(end, len(filtered))} 条，共 {len(filtered)} 条")
+        st.caption(f"显示第 {start+1}-{min(end, len(matches))} 条，共 {len(matches)} 条")
         
         # 显示表格
-        st.table(
-            list(filtered.items())[start:end]
-        )
+        st.dataframe(index.rows(matches[start:end]), hide_index=True, use_container_width=True)
     else:
         st.warning("没有找到匹配的软件包")
 
+def _versions(packages):
+    """只保留 {包名: 版本}，快照中不存位置、描述等大字段"""
+    if not packages or "Error" in packages:
+        return {}
+    return {name: info.get("version", "") if isinstance(info, dict) else info
+            for name, info in packages.items()}
+
+def make_snapshot(system_pkgs, python_pkgs, os_info):
+    """生成紧凑的软件清单快照"""
+    return {
+        "format": 1,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "host": os_info.get("Hostname", gethostname()),
+        "os": {k: v for k, v in os_info.items() if k != "Error"},
+        "system": _versions(system_pkgs),
+        "python": _versions(python_pkgs),
+    }
+
+def save_snapshot(snapshot, name=None):
+    """以 gzip 压缩的 JSON 保存快照，返回文件路径"""
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    if name is None:
+        stamp = snapshot["created"].replace("-", "").replace(":", "").replace(" ", "-")
+        name = f"{snapshot['host']}-{stamp}.json.gz"
+    path = SNAPSHOT_DIR / name
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+    return path
+
+def load_snapshot(source):
+    """从路径或上传的字节内容读取快照，兼容未压缩的 JSON"""
+    data = source.read_bytes() if isinstance(source, Path) else source
+    try:
+        if data[:2] == b"\x1f\x8b":
+            data = gzip.decompress(data)
+        snapshot = json.loads(data.decode("utf-8"))
+    except (OSError, EOFError, zlib.error, ValueError) as e:
+        raise ValueError(f"无法解析快照文件: {e}") from e
+    if not isinstance(snapshot, dict) or not all(
+        isinstance(snapshot.get(key), dict) for key in ("system", "python")
+    ):
+        raise ValueError("不是有效的软件清单快照")
+    # 缺失的元数据补默认值，版本统一为字符串以便比较
+    snapshot.setdefault("host", "未知主机")
+    snapshot.setdefault("created", "未知时间")
+    if not isinstance(snapshot.get("os"), dict):
+        snapshot["os"] = {}
+    for key in ("system", "python"):
+        snapshot[key] = {str(name): str(version) for name, version in snapshot[key].items()}
+    return snapshot
+
+def list_snapshots():
+    """快照文件按修改时间倒序排列"""
+    if not SNAPSHOT_DIR.exists():
+        return []
+    return sorted(SNAPSHOT_DIR.glob("*.json*"), key=lambda p: p.stat().st_mtime, reverse=True)
+
+def _version_key(version):
+    """按数字/非数字片段拆分的自然排序键，用于判断升级还是降级"""
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part)
+            for part in re.findall(r"\d+|[^\d]+", version)]
+
+def diff_packages(old, new):
+    """基于集合运算对比两份 {包名: 版本}，返回按名称排序的变化表"""
+    old_names, new_names = old.keys(), new.keys()
+    rows = [(name, "新增", "", new[name]) for name in new_names - old_names]
+    rows += [(name, "删除", old[name], "") for name in old_names - new_names]
+    for name in old_names & new_names:
+        if old[name] != new[name]:
+            change = "升级" if _version_key(new[name]) > _version_key(old[name]) else "降级"
+            rows.append((name, change, old[name], new[name]))
+    rows.sort()
+    return pd.DataFrame(rows, columns=["名称", "变化", "旧版本", "新版本"])
+
+def display_snapshots():
+    """快照保存、导入与对比"""
+    st.markdown("## 🗂️ 清单快照与对比")
+    has_current = 'system_pkgs' in st.session_state and 'python_pkgs' in st.session_state
+
+    cols = st.columns([1, 2])
+    with cols[0]:
+        if st.button("💾 保存当前快照", disabled=not has_current,
+                     help="需先刷新或加载软件清单"):
+            snapshot = make_snapshot(
+                st.session_state.system_pkgs, st.session_state.python_pkgs, get_os_info()
+            )
+            st.success(f"已保存：{save_snapshot(snapshot).name}")
+    with cols[1]:
+        uploaded = st.file_uploader("导入其他主机的快照", type=["gz", "json"], key="snapshot_upload")
+        if uploaded is not None:
+            try:
+                snapshot = load_snapshot(uploaded.getvalue())
+                # 保存时总是 gzip 压缩，统一命名为 <名称>.json.gz 以便列出和识别
+                stem = Path(uploaded.name).name.removesuffix(".gz").removesuffix(".json")
+                name = f"{stem}.json.gz"
+                if not (SNAPSHOT_DIR / name).exists():
+                    save_snapshot(snapshot, name=name)
+                    st.success(f"已导入：{name}")
+            except ValueError as e:
+                st.error(f"导入失败: {e}")
+
+    snapshots = {path.name: path for path in list_snapshots()}
+    options = (["当前状态"] if has_current else []) + list(snapshots)
+    if len(options) < 2:
+        st.info("至少需要两个快照(或一个快照加当前状态)才能对比")
+        return
+
+    cols = st.columns(2)
+    with cols[0]:
+        base = st.selectbox("基准", options, index=1, key="snapshot_base")
+    with cols[1]:
+        target = st.selectbox("对比", options, index=0, key="snapshot_target")
+
+    def resolve(option):
+        if option == "当前状态":
+            return make_snapshot(st.session_state.system_pkgs, st.session_state.python_pkgs, get_os_info())
+        return load_snapshot(snapshots[option])
+
+    try:
+        old, new = resolve(base), resolve(target)
+    except (OSError, ValueError) as e:
+        st.error(f"读取快照失败: {e}")
+        return
+
+    st.caption(f"{old['host']} ({old['created']}) → {new['host']} ({new['created']})")
+    if base in snapshots:
+        st.download_button("下载基准快照", snapshots[base].read_bytes(), file_name=base)
+
+    tabs = st.tabs(["系统软件", "Python包", "操作系统"])
+    for tab, source in zip(tabs[:2], ["system", "python"]):
+        with tab:
+            diff = diff_packages(old[source], new[source])
+            counts = diff["变化"].value_counts()
+            metric_cols = st.columns(4)
+            for col, change in zip(metric_cols, ["新增", "删除", "升级", "降级"]):
+                col.metric(change, int(counts.get(change, 0)))
+            if diff.empty:
+                st.success("没有差异")
+            else:
+                st.dataframe(diff, hide_index=True, use_container_width=True, height=300)
+    with tabs[2]:
+        keys = sorted(old["os"].keys() | new["os"].keys())
+        st.dataframe(
+            pd.DataFrame({
+                "项目": keys,
+                "基准": [str(old["os"].get(k, "")) for k in keys],
+                "对比": [str(new["os"].get(k, "")) for k in keys],
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
+
 # 修改主界面调用
 def main():
     st.set_page_config(
@@ -314,15 +1135,62 @@ def main():
     # 软件信息部分保持不变
     st.markdown("## 📦 已安装软件清单")
 
-    if st.button("🔄 一键刷新所有软件信息", type="primary"):
+    cols = st.columns([2, 1, 3])
+    with cols[0]:
+        refresh = st.button("🔄 一键刷新所有软件信息", type="primary")
+    with cols[1]:
+        force = st.checkbox("忽略缓存", help="默认只重新扫描发生变化的来源")
+
+    if refresh:
         with st.spinner("正在全面扫描系统，可能需要较长时间..."):
-            system_pkgs = get_system_packages()
-            python_pkgs = get_python_packages()
+            progress = st.empty()
+            preview = st.empty()
+            last_update = [0.0]
+
+            def show_preview(packages):
+                # 第一页凑满后只渲染一次表格，之后按时间节流只更新计数
+                if last_update[0] == 0.0:
+                    preview.table(package_rows(list(packages.items())[:PAGE_SIZE]))
+                elif time.monotonic() - last_update[0] < PREVIEW_INTERVAL:
+                    return
+                progress.caption(f"已解析 {len(packages)} 个系统软件包...")
+                last_update[0] = time.monotonic()
+
+            # Python包在线程池中扫描，与需要在主线程预览的系统包扫描并行
+            python_future = get_collector_pool().submit("python", python_inventory, None, force)
+            (system_pkgs, system_cached), system_elapsed = _timed(lambda: get_inventory(
+                "system",
+                system_fingerprint(),
+                lambda: get_system_packages(on_progress=show_preview),
+                force=force,
+            ))
+            progress.empty()
+            preview.empty()
+            try:
+                (python_pkgs, python_cached), python_elapsed = python_future.result(
+                    timeout=COLLECTOR_TIMEOUTS["python"]
+                )
+            except FutureTimeoutError:
+                python_pkgs, python_cached, python_elapsed = {"Error": "扫描失败: 超时"}, False, 0.0
+            except Exception as e:
+                python_pkgs, python_cached, python_elapsed = {"Error": f"扫描失败: {e}"}, False, 0.0
+            st.caption(
+                f"系统软件：{'缓存' if system_cached else '重新扫描'}（{system_elapsed * 1000:.0f} ms），"
+                f"Python包：{'缓存' if python_cached else '重新扫描'}（{python_elapsed * 1000:.0f} ms）"
+            )
             
             # 使用session_state保存结果
             st.session_state.system_pkgs = system_pkgs
             st.session_state.python_pkgs = python_pkgs
 
+    # 新会话直接使用仍然有效的磁盘缓存，无需等待扫描
+    if 'system_pkgs' not in st.session_state:
+        system_pkgs = load_cached_inventory("system", system_fingerprint())
+        python_pkgs = load_cached_inventory("python-current", python_fingerprint())
+        if system_pkgs is not None and python_pkgs is not None:
+            st.session_state.system_pkgs = system_pkgs
+            st.session_state.python_pkgs = python_pkgs
+
     # 显示存储的结果
     if 'system_pkgs' in st.session_state and 'python_pkgs' in st.session_state:
         display_combined_packages(
@@ -330,14 +1198,16 @@ def main():
             st.session_state.python_pkgs
         )
 
+    display_snapshots()
+
     # 注意事项
     st.markdown("""
     ---
     **注意事项**：
     1. 系统软件检测支持：Linux (dpkg)、macOS (Homebrew)、Windows (注册表)
-    2. 公网IP通过第三方API获取，可能受网络环境影响
+    2. 公网IP通过第三方API在后台获取并缓存，可用 PUBLIC_IP_ENDPOINT 指定内部接口或置空关闭
     3. 数据仅反映当前运行环境状态
-    4. 首次加载可能需要30秒左右完成扫描
+    4. 首次加载可能需要30秒左右完成扫描，之后仅在软件包有变化时重新扫描
     """)
 
     # 样式调整
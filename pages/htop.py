@@ -1,22 +1,706 @@
 import streamlit as st
 import psutil
 import pandas as pd
+import numpy as np
+import threading
 import time
+import sys
+import re
+import os
+import logging
 
-def get_processes():
-    processes = []
-    for proc in psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'memory_percent']):
+# 后台采样间隔(秒)，进程内所有会话共享，与页面刷新间隔相互独立
+SAMPLE_INTERVAL = float(os.environ.get("HTOP_SAMPLE_INTERVAL", "1.0"))
+# 进程列表采集后端："psutil" 或 "procfs"(仅Linux)
+PROCESS_BACKEND = os.environ.get("HTOP_PROCESS_BACKEND", "psutil")
+# 原始样本保留时长(秒)，更早的数据只保留按分钟汇总的 min/max/mean
+RAW_HISTORY_SECONDS = 3600
+ROLLUP_SECONDS = 60
+ROLLUP_HISTORY_SECONDS = 24 * 3600
+# 历史图表固定的桶数，渲染开销与时间窗口长度无关
+CHART_BUCKETS = 120
+HISTORY_WINDOWS = {"最近5分钟": 300, "最近1小时": 3600, "最近24小时": 24 * 3600}
+# 磁盘/网卡计数器保留时长(秒)，用于计算速率与绘制近期吞吐曲线
+IO_HISTORY_SECONDS = 300
+DISK_FIELDS = ["read_bytes", "write_bytes", "read_count", "write_count"]
+NET_FIELDS = ["bytes_recv", "bytes_sent", "packets_recv", "packets_sent"]
+# 单进程详情缓存时长(秒)与高频采样保留的样本数
+PROCESS_DETAIL_TTL = 5
+PROCESS_WATCH_SAMPLES = 600
+PROCESS_DETAIL_SECTIONS = ["命令行", "线程", "打开文件", "网络连接", "环境变量", "内存映射"]
+
+PROCESS_COLUMNS = ['PID', 'PPID', 'Name', 'User', 'CPU%', 'MEM%', 'RSS(MB)']
+# 可选的每进程I/O速率列，需要额外读取 /proc/[pid]/io
+PROCESS_IO_COLUMNS = ['读(KB/s)', '写(KB/s)']
+
+logger = logging.getLogger(__name__)
+
+def counter_rates(prev_keys, prev_values, keys, values, elapsed):
+    """按键对齐两次采样的累计计数器，返回每秒速率
+
+    prev_keys 必须已排序。新出现的键速率为0，计数器回绕或重置时截断为0。
+    """
+    rates = np.zeros(values.shape, dtype=np.float64)
+    if len(prev_keys) and elapsed > 0:
+        pos = np.searchsorted(prev_keys, keys).clip(max=len(prev_keys) - 1)
+        matched = prev_keys[pos] == keys
+        rates[matched] = np.maximum(values[matched] - prev_values[pos[matched]], 0) / elapsed
+    return rates
+
+class ProcessTable:
+    """跨刷新复用 psutil.Process 句柄的进程表
+
+    只为新出现的 PID 创建对象，已退出的 PID 被淘汰，因此 cpu_percent 总是
+    相对上一次采样计算，结果才有意义。psutil 的 ppid() 每次都会比较
+    (pid, create_time)，PID 被复用时抛出 NoSuchProcess，此时当场换成新进程
+    的句柄。
+    """
+
+    def __init__(self):
+        self._procs = {}  # pid -> (Process, name, username)
+        self._prev_pids = np.empty(0, dtype=np.int64)
+        self._prev_io = np.empty((0, 2), dtype=np.float64)
+        self._prev_time = None
+
+    @staticmethod
+    def available():
+        return True
+
+    def _add(self, pid):
+        proc = psutil.Process(pid)
+        with proc.oneshot():
+            name = proc.name()
+            try:
+                username = proc.username()
+            except (psutil.AccessDenied, KeyError):
+                username = None
+            # 首次调用只建立基准，返回值恒为0.0
+            proc.cpu_percent(None)
+        self._procs[pid] = (proc, name, username)
+
+    def _read(self, pid, with_io):
+        """读取一个进程的动态指标；无权限时返回0，进程消失时抛出 NoSuchProcess"""
+        proc = self._procs[pid][0]
+        io_value = (np.nan, np.nan)
+        try:
+            with proc.oneshot():
+                # 父进程退出后会被重新挂接，ppid 不能缓存
+                ppid = proc.ppid()
+                cpu_value = proc.cpu_percent(None)
+                mem_value = proc.memory_percent()
+                rss_value = proc.memory_info().rss
+                if with_io:
+                    try:
+                        counters = proc.io_counters()
+                        io_value = (counters.read_bytes, counters.write_bytes)
+                    except psutil.AccessDenied:
+                        pass
+        except psutil.AccessDenied:
+            return 0, 0.0, 0.0, 0, io_value
+        return ppid, cpu_value, mem_value, rss_value, io_value
+
+    def collect(self, with_io=False):
+        """刷新进程表并返回所有进程的 DataFrame；with_io 时附加每进程I/O速率"""
+        now = time.monotonic()
+        current = set(psutil.pids())
+        for pid in self._procs.keys() - current:
+            del self._procs[pid]
+        for pid in current - self._procs.keys():
+            try:
+                self._add(pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+
+        pids, ppids, names, users, cpu, mem, rss, io = [], [], [], [], [], [], [], []
+        for pid in list(self._procs):
+            try:
+                values = self._read(pid, with_io)
+            except psutil.ZombieProcess:
+                del self._procs[pid]
+                continue
+            except psutil.NoSuchProcess:
+                del self._procs[pid]
+                if pid not in current:
+                    continue
+                # PID 已被新进程复用：换成新句柄，cpu_percent 从这次开始重新计算
+                try:
+                    self._add(pid)
+                    values = self._read(pid, with_io)
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    self._procs.pop(pid, None)
+                    continue
+            _, name, username = self._procs[pid]
+            ppid, cpu_value, mem_value, rss_value, io_value = values
+            if with_io:
+                io.append(io_value)
+            pids.append(pid)
+            ppids.append(ppid)
+            names.append(name)
+            users.append(username)
+            cpu.append(cpu_value)
+            mem.append(mem_value)
+            rss.append(rss_value / 1024**2)
+
+        df = pd.DataFrame(
+            {'PID': pids, 'PPID': ppids, 'Name': names, 'User': users,
+             'CPU%': cpu, 'MEM%': mem, 'RSS(MB)': rss},
+            columns=PROCESS_COLUMNS,
+        )
+        if with_io:
+            pid_arr = np.array(pids, dtype=np.int64)
+            io_arr = np.array(io, dtype=np.float64).reshape(-1, 2)
+            elapsed = now - self._prev_time if self._prev_time is not None else 0
+            rates = counter_rates(self._prev_pids, self._prev_io, pid_arr, io_arr, elapsed)
+            df[PROCESS_IO_COLUMNS] = rates / 1024
+            order = np.argsort(pid_arr)
+            self._prev_pids, self._prev_io, self._prev_time = pid_arr[order], io_arr[order], now
+        return df
+
+class ProcFSTable:
+    """直接批量读取 /proc/[pid]/stat 与 /proc/[pid]/statm 的 Linux 进程表
+
+    解析结果先放入列式 NumPy 数组，CPU% 按 (pid, starttime) 与上一次采样
+    对齐后整体计算，最后一次性构建 DataFrame，不为每个进程创建 Python 对象。
+    """
+
+    def __init__(self):
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._mem_total = psutil.virtual_memory().total
+        self._users = {}
+        self._prev_keys = np.empty(0, dtype=np.int64)
+        self._prev_counters = np.empty((0, 3), dtype=np.float64)
+        self._prev_time = None
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith("linux") and os.path.exists("/proc/self/statm")
+
+    def _username(self, uid):
+        if uid not in self._users:
+            try:
+                import pwd
+                self._users[uid] = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                self._users[uid] = str(uid)
+        return self._users[uid]
+
+    @staticmethod
+    def _read_io(pid):
+        """读取 /proc/[pid]/io 中的 read_bytes/write_bytes，无权限时返回 NaN"""
         try:
-            processes.append({
-                'PID': proc.info['pid'],
-                'Name': proc.info['name'],
-                'User': proc.info['username'],
-                'CPU%': proc.info['cpu_percent'],
-                'MEM%': proc.info['memory_percent']
-            })
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            pass
-    return pd.DataFrame(processes).sort_values('CPU%', ascending=False)
+            with open(f"/proc/{pid}/io", "rb") as f:
+                lines = f.read().split(b"\n")
+            return int(lines[4].split()[1]), int(lines[5].split()[1])
+        except (OSError, IndexError):
+            return np.nan, np.nan
+
+    def collect(self, with_io=False):
+        """读取 /proc 并返回所有进程的 DataFrame；with_io 时附加每进程I/O速率"""
+        now = time.monotonic()
+        pids, names, uids, stat_fields, rss_pages, io = [], [], [], [], [], []
+        for entry in os.scandir("/proc"):
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/stat", "rb") as f:
+                    stat = f.read()
+                with open(f"/proc/{entry.name}/statm", "rb") as f:
+                    statm = f.read()
+                uid = entry.stat().st_uid
+            except OSError:
+                # 进程在读取过程中退出
+                continue
+            # comm 可能包含空格和括号，以最后一个 ')' 为界
+            close = stat.rfind(b")")
+            fields = stat[close + 2:].split()
+            pids.append(int(entry.name))
+            names.append(stat[stat.find(b"(") + 1:close].decode(errors="replace"))
+            uids.append(uid)
+            # 字段编号见 proc(5)：ppid(4) utime(14) stime(15) starttime(22)
+            stat_fields.append((fields[11], fields[12], fields[19], fields[1]))
+            rss_pages.append(statm.split()[1])
+            if with_io:
+                io.append(self._read_io(entry.name))
+
+        pid_arr = np.array(pids, dtype=np.int64)
+        stat_arr = np.array(stat_fields, dtype=np.int64).reshape(-1, 4)
+        ticks = stat_arr[:, 0] + stat_arr[:, 1]
+        # pid 不超过 2^22，与启动时间拼成唯一键，PID 复用时自然失配
+        keys = (stat_arr[:, 2] << 22) | pid_arr
+
+        # 列布局 [CPU ticks, 读字节, 写字节]，一次对齐全部计算速率
+        counters = np.zeros((len(keys), 3), dtype=np.float64)
+        counters[:, 0] = ticks
+        if with_io:
+            counters[:, 1:] = np.array(io, dtype=np.float64).reshape(-1, 2)
+        elapsed = now - self._prev_time if self._prev_time is not None else 0
+        rates = counter_rates(self._prev_keys, self._prev_counters, keys, counters, elapsed)
+        cpu = rates[:, 0] / self._clock_ticks * 100
+
+        order = np.argsort(keys)
+        self._prev_keys, self._prev_counters, self._prev_time = keys[order], counters[order], now
+
+        rss = np.array(rss_pages, dtype=np.int64) * self._page_size
+        df = pd.DataFrame(
+            {
+                'PID': pid_arr,
+                'PPID': stat_arr[:, 3],
+                'Name': names,
+                'User': [self._username(uid) for uid in uids],
+                'CPU%': cpu.round(1),
+                'MEM%': rss / self._mem_total * 100,
+                'RSS(MB)': rss / 1024**2,
+            },
+            columns=PROCESS_COLUMNS,
+        )
+        if with_io:
+            df[PROCESS_IO_COLUMNS] = rates[:, 1:] / 1024
+        return df
+
+PROCESS_BACKENDS = {"psutil": ProcessTable, "procfs": ProcFSTable}
+
+def available_backends():
+    return [name for name, cls in PROCESS_BACKENDS.items() if cls.available()]
+
+# 进程树最大深度，防止异常的父子关系导致死循环
+MAX_TREE_DEPTH = 64
+
+def build_process_tree(df):
+    """按 PPID 组织进程树，返回先序排列、带子树汇总值的 DataFrame
+
+    子树汇总用"逐层上跳"的方式向量化完成：每一轮把所有节点的值加到当前
+    祖先上，再把祖先整体替换为祖先的父节点，轮数等于树高而不是进程数。
+    同级节点按子树 CPU% 降序排列。Name 保持原始进程名，树形缩进由
+    tree_labels 只对要显示的行添加。
+    """
+    pids = df['PID'].to_numpy()
+    n = len(pids)
+    order = np.argsort(pids)
+    pos = np.searchsorted(pids[order], df['PPID'].to_numpy()).clip(max=max(n - 1, 0))
+    parent = order[pos] if n else pos
+    # 父进程不在快照中(如PID 0)时视为根节点
+    parent = np.where((pids[parent] == df['PPID'].to_numpy()) & (parent != np.arange(n)), parent, -1)
+
+    values = df[['CPU%', 'MEM%', 'RSS(MB)']].to_numpy(dtype=np.float64)
+    totals = values.copy()
+    counts = np.ones(n, dtype=np.int64)
+    ancestors = [np.arange(n)]
+    current = parent
+    while (current >= 0).any() and len(ancestors) <= MAX_TREE_DEPTH:
+        valid = current >= 0
+        np.add.at(totals, current[valid], values[valid])
+        np.add.at(counts, current[valid], 1)
+        ancestors.append(current)
+        current = np.where(valid, parent[current], -1)
+    depth = (np.stack(ancestors, axis=1) >= 0).sum(axis=1) - 1
+
+    # 先序：以"根→自身"路径上各节点的同级排名为键做字典序排序
+    rank = np.empty(n, dtype=np.int64)
+    rank[np.argsort(-totals[:, 0], kind="stable")] = np.arange(n)
+    anc = np.stack(ancestors, axis=1)
+    steps = depth[:, None] - np.arange(anc.shape[1])[None, :]
+    path = np.where(
+        steps >= 0,
+        rank[anc[np.arange(n)[:, None], steps.clip(min=0)]],
+        -1,
+    )
+    preorder = np.lexsort(path.T[::-1])
+
+    tree = pd.DataFrame({
+        'PID': pids,
+        'PPID': df['PPID'].to_numpy(),
+        'Name': df['Name'].to_numpy(),
+        'User': df['User'].to_numpy(),
+        'CPU%': totals[:, 0],
+        'MEM%': totals[:, 1],
+        'RSS(MB)': totals[:, 2],
+        '自身CPU%': values[:, 0],
+        '进程数': counts,
+        'Depth': depth,
+    })
+    return tree.iloc[preorder].reset_index(drop=True)
+
+def tree_labels(tree):
+    """按 Depth 给进程名加上树形缩进，只用于显示当前页"""
+    return ["│  " * (d - 1) + "├─ " + name if d else name
+            for d, name in zip(tree['Depth'], tree['Name'])]
+
+def keep_ancestors(tree, mask):
+    """mask 选中的行再加上它们的全部祖先，使缩进下的父进程始终可见"""
+    position = pd.Series(np.arange(len(tree)), index=tree['PID'].to_numpy())
+    parent = position.reindex(tree['PPID'].to_numpy()).fillna(-1).to_numpy(dtype=np.int64)
+    keep = mask.copy()
+    current = np.nonzero(mask)[0]
+    for _ in range(MAX_TREE_DEPTH):
+        current = parent[current]
+        current = np.unique(current[current >= 0])
+        current = current[~keep[current]]
+        if not len(current):
+            break
+        keep[current] = True
+    return keep
+
+def process_mask(df, name_pattern="", user_pattern="", min_cpu=0.0, min_mem=0.0):
+    """过滤条件对应的布尔数组；正则非法时抛出 re.error"""
+    mask = np.ones(len(df), dtype=bool)
+    if min_cpu > 0:
+        mask &= (df['CPU%'] >= min_cpu).to_numpy()
+    if min_mem > 0:
+        mask &= (df['MEM%'] >= min_mem).to_numpy()
+    if name_pattern:
+        re.compile(name_pattern)
+        mask &= df['Name'].str.contains(name_pattern, case=False, regex=True, na=False).to_numpy()
+    if user_pattern:
+        re.compile(user_pattern)
+        mask &= df['User'].str.contains(user_pattern, case=False, regex=True, na=False).to_numpy()
+    return mask
+
+def filter_processes(df, name_pattern="", user_pattern="", min_cpu=0.0, min_mem=0.0,
+                     sort_key="CPU%", descending=True, page_size=50, page=1):
+    """在服务端完成过滤、排序与分页，只返回当前页的行
+
+    返回 (当前页DataFrame, 过滤后总行数)。数值列排序使用 nlargest/nsmallest，
+    只对前 page*page_size 行做部分排序；sort_key 为 None 时保持原有顺序
+    (用于进程树)。正则非法时抛出 re.error。
+    """
+    filtered = df[process_mask(df, name_pattern, user_pattern, min_cpu, min_mem)]
+
+    total = len(filtered)
+    start = (page - 1) * page_size
+    end = start + page_size
+    if sort_key is None:
+        top = filtered
+    elif pd.api.types.is_numeric_dtype(filtered[sort_key]):
+        top = filtered.nlargest(end, sort_key) if descending else filtered.nsmallest(end, sort_key)
+    else:
+        top = filtered.sort_values(sort_key, ascending=not descending, key=lambda col: col.str.lower())
+    return top.iloc[start:end], total
+
+class RingBuffer:
+    """定长数组环形缓冲区，内存占用与服务器运行时长无关"""
+
+    def __init__(self, capacity, width, dtype=np.float32):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, width), dtype=dtype)
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, row):
+        self.timestamps[self._next] = timestamp
+        self.values[self._next] = row
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def view(self, since=None):
+        """按时间顺序返回 (timestamps, values) 的副本"""
+        if self._size < self.capacity:
+            order = np.arange(self._size)
+        else:
+            order = np.roll(np.arange(self.capacity), -self._next)
+        timestamps = self.timestamps[order]
+        values = self.values[order]
+        if since is not None:
+            start = np.searchsorted(timestamps, since, side="left")
+            timestamps, values = timestamps[start:], values[start:]
+        return timestamps, values
+
+def downsample(timestamps, mean, low, high, start, end, buckets=CHART_BUCKETS):
+    """把 [start, end] 区间的样本压缩成固定数量的桶，返回每桶的 mean/min/max
+
+    mean/low/high 形状相同；原始样本三者为同一数组，汇总样本分别传入。
+    空桶直接丢弃，不产生占位行。
+    """
+    edges = np.linspace(start, end, buckets + 1)
+    first = np.searchsorted(timestamps, start, side="left")
+    last = np.searchsorted(timestamps, end, side="right")
+    timestamps = timestamps[first:last]
+    if len(timestamps) == 0:
+        return edges[:0], mean[:0], low[:0], high[:0]
+    mean, low, high = mean[first:last], low[first:last], high[first:last]
+
+    starts = np.searchsorted(timestamps, edges[:-1], side="left")
+    counts = np.diff(np.append(starts, len(timestamps)))
+    nonempty = counts > 0
+    starts, counts = starts[nonempty], counts[nonempty]
+
+    sums = np.add.reduceat(mean.astype(np.float64), starts, axis=0)
+    return (
+        edges[:-1][nonempty],
+        sums / counts[:, None],
+        np.minimum.reduceat(low, starts, axis=0),
+        np.maximum.reduceat(high, starts, axis=0),
+    )
+
+class MetricsHistory:
+    """CPU/内存/交换空间的时间序列，原始样本 + 分钟级汇总两级存储
+
+    每行的列布局为 [CPU总体, 内存, 交换空间, Core 0, Core 1, ...]。
+    """
+
+    def __init__(self, num_cores, interval=SAMPLE_INTERVAL):
+        self.columns = ["CPU总体", "内存", "交换空间"] + [f"Core {i}" for i in range(num_cores)]
+        width = len(self.columns)
+        self._lock = threading.Lock()
+        self._raw = RingBuffer(max(1, int(RAW_HISTORY_SECONDS / interval)), width)
+        # 汇总行布局为 [mean | min | max]
+        self._rollup = RingBuffer(ROLLUP_HISTORY_SECONDS // ROLLUP_SECONDS, width * 3)
+        self._bucket_start = None
+        self._bucket_sum = np.zeros(width, dtype=np.float64)
+        self._bucket_min = np.full(width, np.inf, dtype=np.float32)
+        self._bucket_max = np.full(width, -np.inf, dtype=np.float32)
+        self._bucket_count = 0
+
+    def append(self, timestamp, cpu_percent, mem_percent, swap_percent):
+        row = np.empty(len(self.columns), dtype=np.float32)
+        row[0] = np.mean(cpu_percent) if len(cpu_percent) else 0.0
+        row[1] = mem_percent
+        row[2] = swap_percent
+        row[3:] = cpu_percent[:len(row) - 3]
+        bucket = timestamp - timestamp % ROLLUP_SECONDS
+        with self._lock:
+            self._raw.append(timestamp, row)
+            if self._bucket_start is not None and bucket != self._bucket_start:
+                self._flush_bucket()
+            self._bucket_start = bucket
+            self._bucket_sum += row
+            np.minimum(self._bucket_min, row, out=self._bucket_min)
+            np.maximum(self._bucket_max, row, out=self._bucket_max)
+            self._bucket_count += 1
+
+    def _flush_bucket(self):
+        mean = (self._bucket_sum / self._bucket_count).astype(np.float32)
+        self._rollup.append(
+            self._bucket_start,
+            np.concatenate([mean, self._bucket_min, self._bucket_max]),
+        )
+        self._bucket_sum[:] = 0
+        self._bucket_min[:] = np.inf
+        self._bucket_max[:] = -np.inf
+        self._bucket_count = 0
+
+    def query(self, column, window_seconds, buckets=CHART_BUCKETS):
+        """返回最近 window_seconds 秒内某一列降采样后的 DataFrame(平均/最小/最大)"""
+        index = self.columns.index(column)
+        end = time.time()
+        start = end - window_seconds
+        width = len(self.columns)
+        with self._lock:
+            if window_seconds <= RAW_HISTORY_SECONDS:
+                timestamps, values = self._raw.view(since=start)
+                values = values[:, [index]]
+                mean = low = high = values
+            else:
+                timestamps, values = self._rollup.view(since=start)
+                mean = values[:, [index]]
+                low = values[:, [width + index]]
+                high = values[:, [2 * width + index]]
+        bucket_ts, mean, low, high = downsample(timestamps, mean, low, high, start, end, buckets)
+        return pd.DataFrame(
+            {"平均": mean[:, 0], "最小": low[:, 0], "最大": high[:, 0]},
+            index=pd.to_datetime(bucket_ts, unit="s"),
+        )
+
+class CounterHistory:
+    """按设备保存累计计数器(磁盘/网卡)的环形缓冲区，速率由相邻样本差分得到
+
+    每行布局为 devices × fields 展平后的计数器值；设备集合变化时(热插拔)
+    丢弃旧数据重新开始。
+    """
+
+    def __init__(self, fields, interval=SAMPLE_INTERVAL):
+        self.fields = fields
+        self.devices = []
+        self._capacity = max(2, int(IO_HISTORY_SECONDS / interval) + 1)
+        self._lock = threading.Lock()
+        self._buffer = RingBuffer(self._capacity, 0, dtype=np.float64)
+
+    def append(self, timestamp, counters):
+        devices = sorted(counters or {})
+        row = np.array(
+            [[getattr(counters[dev], field) for field in self.fields] for dev in devices],
+            dtype=np.float64,
+        ).reshape(-1)
+        with self._lock:
+            if devices != self.devices:
+                self.devices = devices
+                self._buffer = RingBuffer(self._capacity, len(row), dtype=np.float64)
+            self._buffer.append(timestamp, row)
+
+    def _rates(self):
+        """返回 (时间戳, 形状为 样本数-1 × 设备 × 字段 的速率数组)"""
+        with self._lock:
+            timestamps, values = self._buffer.view()
+            devices = self.devices
+        if len(timestamps) < 2:
+            return timestamps[:0], np.zeros((0, len(devices), len(self.fields))), devices
+        elapsed = np.diff(timestamps)[:, None]
+        rates = np.maximum(np.diff(values, axis=0), 0) / elapsed
+        return timestamps[1:], rates.reshape(len(rates), len(devices), len(self.fields)), devices
+
+    def latest_rates(self):
+        """最近两次采样之间各设备的每秒速率"""
+        _, rates, devices = self._rates()
+        if len(rates) == 0:
+            return pd.DataFrame(columns=self.fields)
+        return pd.DataFrame(rates[-1], index=devices, columns=self.fields)
+
+    def total_series(self, fields):
+        """近期各采样点所有设备合计的速率曲线"""
+        timestamps, rates, _ = self._rates()
+        columns = [self.fields.index(field) for field in fields]
+        return pd.DataFrame(
+            rates[:, :, columns].sum(axis=1),
+            index=pd.to_datetime(timestamps, unit="s"),
+            columns=fields,
+        )
+
+class MetricsSampler:
+    """进程级后台采样线程，所有浏览器会话共享同一份快照"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._ready = threading.Event()
+        self.last_error = None
+        self.history = MetricsHistory(psutil.cpu_count() or 1, interval)
+        self.disk_io = CounterHistory(DISK_FIELDS, interval)
+        self.net_io = CounterHistory(NET_FIELDS, interval)
+        self.process_io = False
+        self._tables = {}
+        self.backend = PROCESS_BACKEND if PROCESS_BACKEND in available_backends() else "psutil"
+        self._thread = threading.Thread(target=self._run, name="htop-sampler", daemon=True)
+        # 预热：cpu_percent首次调用总是返回0.0
+        psutil.cpu_percent(percpu=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def set_backend(self, backend):
+        """切换进程采集后端，对所有会话生效；各后端的进程表保留以便切回时复用"""
+        if backend in available_backends():
+            self.backend = backend
+
+    def _process_table(self, backend):
+        if backend not in self._tables:
+            self._tables[backend] = PROCESS_BACKENDS[backend]()
+        return self._tables[backend]
+
+    def _sample(self):
+        backend = self.backend
+        started = time.perf_counter()
+        processes = self._process_table(backend).collect(with_io=self.process_io)
+        collect_seconds = time.perf_counter() - started
+        snapshot = {
+            "timestamp": time.time(),
+            "cpu_percent": psutil.cpu_percent(percpu=True),
+            "memory": psutil.virtual_memory(),
+            "swap": psutil.swap_memory(),
+            "processes": processes,
+            "process_backend": backend,
+            "collect_seconds": collect_seconds,
+        }
+        self.history.append(
+            snapshot["timestamp"],
+            snapshot["cpu_percent"],
+            snapshot["memory"].percent,
+            snapshot["swap"].percent,
+        )
+        self.disk_io.append(snapshot["timestamp"], psutil.disk_io_counters(perdisk=True))
+        self.net_io.append(snapshot["timestamp"], psutil.net_io_counters(pernic=True))
+        return snapshot
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                snapshot = self._sample()
+                with self._lock:
+                    self._snapshot = snapshot
+                self.last_error = None
+                self._ready.set()
+            except Exception as e:
+                # 单次采样失败不终止线程，保留上一次快照；面板会提示数据已过期
+                logger.exception("htop 采样失败")
+                self.last_error = f"{type(e).__name__}: {e}"
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def latest(self, timeout=None):
+        """返回最新快照；首次采样完成前最多等待timeout秒"""
+        self._ready.wait(timeout)
+        with self._lock:
+            return self._snapshot
+
+@st.cache_resource
+def get_sampler():
+    """整个Streamlit进程只启动一个采样线程"""
+    return MetricsSampler().start()
+
+def _records(items):
+    return pd.DataFrame([item._asdict() for item in items])
+
+def _connection_records(connections):
+    return pd.DataFrame([{
+        "fd": conn.fd,
+        "type": conn.type.name,
+        "laddr": ":".join(map(str, conn.laddr)) if conn.laddr else "",
+        "raddr": ":".join(map(str, conn.raddr)) if conn.raddr else "",
+        "status": conn.status,
+    } for conn in connections])
+
+@st.cache_data(ttl=PROCESS_DETAIL_TTL, show_spinner=False)
+def get_process_details(pid, section):
+    """按需采集单个进程某一类详细信息，结果短时间缓存
+
+    只在选中进程并切换到对应分类时才调用，不会为进程表中的每一行采集。
+    """
+    proc = psutil.Process(pid)
+    try:
+        if section == "命令行":
+            return " ".join(proc.cmdline())
+        if section == "线程":
+            return _records(proc.threads())
+        if section == "打开文件":
+            return _records(proc.open_files())
+        if section == "网络连接":
+            return _connection_records(proc.net_connections(kind="inet"))
+        if section == "环境变量":
+            return pd.DataFrame(sorted(proc.environ().items()), columns=["变量", "值"])
+        if section == "内存映射":
+            return _records(proc.memory_maps(grouped=True))
+    except psutil.AccessDenied:
+        return "无权限读取该信息"
+    raise ValueError(f"Unknown section: {section}")
+
+class ProcessWatch:
+    """单个进程的高频采样器，每个会话独立持有，频率不受全局采样间隔限制"""
+
+    COLUMNS = ["CPU%", "RSS(MB)", "线程数"]
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.process = psutil.Process(pid)
+        self.process.cpu_percent(None)
+        self.samples = RingBuffer(PROCESS_WATCH_SAMPLES, len(self.COLUMNS))
+
+    def sample(self):
+        with self.process.oneshot():
+            row = [
+                self.process.cpu_percent(None),
+                self.process.memory_info().rss / 1024**2,
+                self.process.num_threads(),
+            ]
+        self.samples.append(time.time(), row)
+
+    def frame(self):
+        timestamps, values = self.samples.view()
+        return pd.DataFrame(values, index=pd.to_datetime(timestamps, unit="s"), columns=self.COLUMNS)
 
 def display_cpu_cores(cpu_percent):
     st.subheader("CPU核心使用情况")
@@ -34,10 +718,8 @@ def display_cpu_cores(cpu_percent):
                     st.metric(label, f"{value:.1f}%")
                     st.progress(value / 100)
 
-def display_memory():
+def display_memory(mem, swap):
     st.subheader("内存使用详情")
-    mem = psutil.virtual_memory()
-    swap = psutil.swap_memory()
     
     col1, col2 = st.columns(2)
     
@@ -56,57 +738,266 @@ def display_memory():
             st.progress(swap.percent / 100)
         st.metric("已用交换", f"{swap.used / (1024**3):.2f} GB")
 
+def display_history(history, column, window_label):
+    st.subheader(f"历史趋势：{column}（{window_label}）")
+    df = history.query(column, HISTORY_WINDOWS[window_label])
+    if df.empty:
+        st.info("暂无历史数据")
+        return
+    st.line_chart(df, y_label="%", height=250)
+
+def display_io(sampler):
+    st.subheader("磁盘与网络 I/O")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("**磁盘**")
+        disk = sampler.disk_io.latest_rates()
+        if disk.empty:
+            st.info("暂无磁盘计数器数据")
+        else:
+            st.dataframe(
+                pd.DataFrame({
+                    "读(MB/s)": disk["read_bytes"] / 1024**2,
+                    "写(MB/s)": disk["write_bytes"] / 1024**2,
+                    "读IOPS": disk["read_count"],
+                    "写IOPS": disk["write_count"],
+                }).sort_values("读(MB/s)", ascending=False),
+                use_container_width=True,
+            )
+            st.line_chart(
+                sampler.disk_io.total_series(["read_bytes", "write_bytes"]) / 1024**2,
+                y_label="MB/s",
+                height=200,
+            )
+
+    with col2:
+        st.markdown("**网络**")
+        net = sampler.net_io.latest_rates()
+        if net.empty:
+            st.info("暂无网卡计数器数据")
+        else:
+            st.dataframe(
+                pd.DataFrame({
+                    "接收(MB/s)": net["bytes_recv"] / 1024**2,
+                    "发送(MB/s)": net["bytes_sent"] / 1024**2,
+                    "接收包/s": net["packets_recv"],
+                    "发送包/s": net["packets_sent"],
+                }).sort_values("接收(MB/s)", ascending=False),
+                use_container_width=True,
+            )
+            st.line_chart(
+                sampler.net_io.total_series(["bytes_recv", "bytes_sent"]) / 1024**2,
+                y_label="MB/s",
+                height=200,
+            )
+
+def process_filter_controls():
+    """侧边栏中的进程过滤/排序/分页设置"""
+    with st.sidebar.expander("进程过滤与排序", expanded=False):
+        options = {
+            "name_pattern": st.text_input("进程名(正则)", key="proc_name_pattern"),
+            "user_pattern": st.text_input("用户(正则)", key="proc_user_pattern"),
+            "min_cpu": st.number_input("最低CPU%", 0.0, 10000.0, 0.0, step=1.0),
+            "min_mem": st.number_input("最低MEM%", 0.0, 100.0, 0.0, step=0.5),
+            "tree": st.checkbox("树状模式(按父进程汇总)", False, key="proc_tree"),
+            "max_depth": st.number_input("树深度上限", 0, MAX_TREE_DEPTH, MAX_TREE_DEPTH,
+                                         help="0 只显示根进程，数值为其整棵子树的汇总"),
+            "sort_key": st.selectbox("排序字段", PROCESS_COLUMNS + PROCESS_IO_COLUMNS,
+                                     index=PROCESS_COLUMNS.index('CPU%'),
+                                     help="树状模式下按子树CPU%排序；I/O列需开启每进程I/O"),
+            "descending": st.checkbox("降序", True),
+            "page_size": st.selectbox("每页行数", [25, 50, 100, 200], index=1),
+            "page": st.number_input("页码", min_value=1, value=1, step=1),
+        }
+    return options
+
+def display_processes(snapshot, options):
+    st.subheader("进程列表")
+    options = dict(options)
+    tree_mode = options.pop("tree")
+    max_depth = options.pop("max_depth")
+    df = snapshot["processes"]
+    try:
+        if tree_mode:
+            # 过滤条件作用于原始进程名，匹配的进程连同祖先一起保留，再分页
+            df = build_process_tree(df)
+            filters = {key: options.pop(key) for key in ("name_pattern", "user_pattern", "min_cpu", "min_mem")}
+            mask = process_mask(df, **filters) & (df['Depth'] <= max_depth).to_numpy()
+            df = df[keep_ancestors(df, mask)]
+            options.update(sort_key=None)
+        elif options["sort_key"] not in df.columns:
+            options.update(sort_key='CPU%')
+        page_df, total = filter_processes(df, **options)
+    except re.error as e:
+        st.error(f"正则表达式无效: {e}")
+        return
+    if tree_mode:
+        page_df = page_df.assign(Name=tree_labels(page_df)).drop(columns='Depth')
+    total_pages = max(1, (total + options["page_size"] - 1) // options["page_size"])
+    st.caption(
+        f"采集后端：{snapshot['process_backend']}，"
+        f"耗时 {snapshot['collect_seconds'] * 1000:.1f} ms，"
+        f"共 {len(snapshot['processes'])} 个进程，匹配 {total} 个，"
+        f"第 {min(options['page'], total_pages)}/{total_pages} 页"
+    )
+    # 选中行只记录PID；行号会随下一次刷新的排序变化而失效
+    st.session_state.process_page_pids = page_df['PID'].tolist()
+    st.dataframe(
+        page_df,
+        key="process_table",
+        on_select=select_process,
+        selection_mode="single-row",
+        column_config={
+            "CPU%": st.column_config.ProgressColumn(
+                "CPU%",
+                format="%.1f%%",
+                min_value=0,
+                max_value=100,
+            ),
+            "MEM%": st.column_config.ProgressColumn(
+                "MEM%",
+                format="%.1f%%",
+                min_value=0,
+                max_value=100,
+            ),
+            "RSS(MB)": st.column_config.NumberColumn("RSS(MB)", format="%.1f"),
+        },
+        hide_index=True,
+        use_container_width=True,
+        height=400
+    )
+
+def select_process():
+    rows = st.session_state.process_table.selection.rows
+    pids = st.session_state.get("process_page_pids", [])
+    if rows and rows[0] < len(pids):
+        st.session_state.drill_pid = int(pids[rows[0]])
+
+def drilldown_panel():
+    st.subheader("进程详情")
+    pid = st.number_input("PID（在进程列表中选中一行，或直接输入）", min_value=0, step=1, key="drill_pid")
+    if not pid:
+        return
+
+    watch = st.session_state.get("process_watch")
+    try:
+        if watch is None or watch.pid != pid:
+            watch = st.session_state.process_watch = ProcessWatch(pid)
+        watch.sample()
+    except (psutil.NoSuchProcess, psutil.ZombieProcess):
+        st.session_state.pop("process_watch", None)
+        st.warning(f"进程 {pid} 不存在或已退出")
+        return
+    except psutil.AccessDenied:
+        st.warning(f"无权限访问进程 {pid}")
+        return
+
+    df = watch.frame()
+    latest = df.iloc[-1]
+    cols = st.columns(4)
+    cols[0].metric("名称", watch.process.name())
+    cols[1].metric("CPU%", f"{latest['CPU%']:.1f}%")
+    cols[2].metric("RSS", f"{latest['RSS(MB)']:.1f} MB")
+    cols[3].metric("线程数", int(latest['线程数']))
+    st.line_chart(df[["CPU%"]], y_label="%", height=180)
+
+    section = st.radio("详细信息", PROCESS_DETAIL_SECTIONS, horizontal=True, key="drill_section")
+    try:
+        details = get_process_details(pid, section)
+    except (psutil.NoSuchProcess, psutil.ZombieProcess):
+        st.warning(f"进程 {pid} 已退出")
+        return
+    if isinstance(details, str):
+        st.code(details or "(空)", language="bash")
+    elif details.empty:
+        st.info("无数据")
+    else:
+        st.dataframe(details, hide_index=True, use_container_width=True, height=300)
+
+def display_freshness(sampler, snapshot):
+    """显示快照的采样时间；连续多次采样失败时提示数据已过期"""
+    age = time.time() - snapshot["timestamp"]
+    if age > max(3 * sampler.interval, 5):
+        reason = sampler.last_error or "采样线程无响应"
+        st.warning(f"⚠️ 数据已 {age:.0f} 秒未更新（{reason}）")
+    else:
+        st.caption(f"采样于 {time.strftime('%H:%M:%S', time.localtime(snapshot['timestamp']))}")
+
+def cpu_panel(sampler):
+    snapshot = sampler.latest(timeout=5)
+    if snapshot is None:
+        st.info("等待首次采样...")
+        return
+    display_cpu_cores(snapshot["cpu_percent"])
+    display_freshness(sampler, snapshot)
+
+def memory_panel(sampler):
+    snapshot = sampler.latest(timeout=5)
+    if snapshot is None:
+        return
+    display_memory(snapshot["memory"], snapshot["swap"])
+    display_freshness(sampler, snapshot)
+
+def process_panel(sampler, options):
+    snapshot = sampler.latest(timeout=5)
+    if snapshot is None:
+        return
+    display_processes(snapshot, options)
+    display_freshness(sampler, snapshot)
+
+def io_panel(sampler):
+    snapshot = sampler.latest(timeout=5)
+    if snapshot is None:
+        return
+    display_io(sampler)
+    display_freshness(sampler, snapshot)
+
 def main():
     st.set_page_config(page_title="Advanced System Monitor", layout="wide")
     st.title("🖥️ 高级系统监控（htop增强版）")
 
-    # 自定义设置
-    refresh_interval = st.sidebar.slider("刷新间隔(秒)", 1, 10, 2)
+    # 自定义设置：各区域独立刷新，互不触发整页重跑
+    with st.sidebar.expander("刷新间隔(秒)", expanded=True):
+        cpu_interval = st.slider("CPU", 1, 10, 2)
+        mem_interval = st.slider("内存", 1, 30, 5)
+        history_interval = st.slider("历史趋势", 5, 60, 10)
+        io_interval = st.slider("磁盘与网络", 1, 30, 3)
+        process_interval = st.slider("进程列表", 1, 30, 3)
+        drill_interval = st.select_slider("进程详情采样", [0.5, 1, 2, 5], value=1)
     show_swap = st.sidebar.checkbox("显示交换空间", True)
+    sampler = get_sampler()
+    st.sidebar.caption(f"后台采样间隔：{sampler.interval:g} 秒（所有会话共享）")
+    backends = available_backends()
+    st.sidebar.radio(
+        "进程采集后端",
+        backends,
+        index=backends.index(sampler.backend),
+        key="process_backend",
+        on_change=lambda: sampler.set_backend(st.session_state.process_backend),
+        help="procfs 直接批量读取 /proc，仅支持Linux；切换对所有会话生效",
+    )
+    st.sidebar.checkbox(
+        "采集每进程I/O速率",
+        value=sampler.process_io,
+        key="process_io",
+        on_change=lambda: setattr(sampler, "process_io", st.session_state.process_io),
+        help="额外读取 /proc/[pid]/io，进程多时会增加采集耗时；切换对所有会话生效",
+    )
+    history_column = st.sidebar.selectbox("历史指标", sampler.history.columns)
+    history_window = st.sidebar.selectbox("历史时间窗口", list(HISTORY_WINDOWS), index=1)
+    process_options = process_filter_controls()
 
-    # 创建占位符
-    cpu_placeholder = st.empty()
-    mem_placeholder = st.empty()
-    process_placeholder = st.empty()
-
-    while True:
-        # 获取CPU数据
-        cpu_percent = psutil.cpu_percent(percpu=True)
-        
-        # 更新CPU显示
-        with cpu_placeholder.container():
-            display_cpu_cores(cpu_percent)
-        
-        # 更新内存显示
-        with mem_placeholder.container():
-            display_memory()
-        
-        # 更新进程列表
-        with process_placeholder.container():
-            st.subheader("进程列表")
-            df = get_processes()
-            st.dataframe(
-                df,
-                column_config={
-                    "CPU%": st.column_config.ProgressColumn(
-                        "CPU%",
-                        format="%.1f%%",
-                        min_value=0,
-                        max_value=100,
-                    ),
-                    "MEM%": st.column_config.ProgressColumn(
-                        "MEM%",
-                        format="%.1f%%",
-                        min_value=0,
-                        max_value=100,
-                    )
-                },
-                hide_index=True,
-                use_container_width=True,
-                height=400
-            )
-        
-        time.sleep(refresh_interval)
+    # 每个区域是一个定时重跑的 fragment，脚本本身执行完即返回，
+    # 浏览器断开后不再占用任何脚本线程
+    st.fragment(cpu_panel, run_every=cpu_interval)(sampler)
+    st.fragment(memory_panel, run_every=mem_interval)(sampler)
+    st.fragment(display_history, run_every=history_interval)(
+        sampler.history, history_column, history_window
+    )
+    st.fragment(io_panel, run_every=io_interval)(sampler)
+    st.fragment(process_panel, run_every=process_interval)(sampler, process_options)
+    st.fragment(drilldown_panel, run_every=drill_interval)()
 
 if __name__ == "__main__":
     main()
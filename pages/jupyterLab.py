@@ -1,15 +1,17 @@
 import streamlit as st
-import subprocess
 import sys
 import os
 from io import StringIO
 from contextlib import redirect_stdout
+from command_runner import execute
+from jobs_ui import job_panel, submit_job
+from command_history import get_history, history_panel
 
 # 初始化session状态
 if 'cwd' not in st.session_state:
     st.session_state.cwd = os.getcwd()
-if 'history' not in st.session_state:
-    st.session_state.history = []
+# 命令终端与Python编辑器的历史保存在磁盘上
+history = get_history("jupyterlab")
 if 'files' not in st.session_state:
     st.session_state.files = []
 
@@ -29,24 +31,30 @@ function = st.sidebar.selectbox(
 if function == "命令终端":
     st.header("系统终端模拟")
     command = st.text_input("输入命令（当前目录：{}）".format(st.session_state.cwd))
+    background = st.checkbox("后台运行")
     
-    if st.button("执行命令"):
+    clicked = st.button("执行命令")
+    
+    if clicked and background and command:
+        cwd = st.session_state.cwd
+        submit_job(command, lambda on_output, cancel: execute(
+            command, on_output=on_output, cancel=cancel, cwd=cwd
+        ))
+    elif clicked:
         try:
-            process = subprocess.run(
-                command.split(),
-                cwd=st.session_state.cwd,
-                capture_output=True,
-                text=True
-            )
-            output = f"STDOUT:\n{process.stdout}\nSTDERR:\n{process.stderr}"
+            result = execute(command, cwd=st.session_state.cwd, cache=True)
+            output = f"STDOUT:\n{result['stdout']}\nSTDERR:\n{result['stderr'] or result.get('error', '')}"
         except Exception as e:
+            result = {"error": str(e)}
             output = str(e)
         
-        st.session_state.history.append(f"$ {command}\n{output}")
+        history.append(f"$ {command}", result)
         st.code(output)
     
     with st.expander("命令历史"):
-        st.code("\n\n".join(st.session_state.history[-5:]))
+        history_panel(history, "jupyterlab_history")
+    
+    job_panel()
 
 # Python编辑器模块
 elif function == "Python编辑器":
@@ -59,10 +67,12 @@ elif function == "Python编辑器":
             with redirect_stdout(stdout):
                 exec(code)
             output = stdout.getvalue()
+            result = {"stdout": output, "returncode": 0}
         except Exception as e:
             output = str(e)
+            result = {"stdout": stdout.getvalue(), "error": output, "returncode": 1}
         
-        st.session_state.history.append(f"In []: {code}\nOut[]: {output}")
+        history.append(f"In []: {code}", result)
         st.code(output)
 
 # 文件管理模块
@@ -1,18 +1,16 @@
 import streamlit as st
-import subprocess
+from command_runner import execute
+from jobs_ui import job_panel, submit_job
 
 def run_command(command):
+    """执行命令；pip list、pip --version 等只读命令的结果会被短时间缓存"""
     try:
-        result = subprocess.run(
-            command.split(),
-            check=True,
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        return f"$ {command}\n{result.stdout}"
-    except subprocess.CalledProcessError as e:
-        return f"$ {command}\nError: {e.stderr}"
+        result = execute(command, timeout=30, cache=True)
+        if result.get("error"):
+            return f"$ {command}\nError: {result['error']}"
+        if result["returncode"] != 0:
+            return f"$ {command}\nError: {result['stderr']}"
+        return f"$ {command}\n{result['stdout']}"
     except Exception as e:
         return f"$ {command}\nError: {str(e)}"
 
@@ -22,10 +20,18 @@ st.warning("注意：此工具仅用于演示目的，请谨慎执行系统命
 command = st.text_input("输入命令行指令（例如：pip --version）", 
                        placeholder="输入有效的系统命令")
 
+background = st.checkbox("后台运行", help="作为后台任务执行（如 pip install），不受30秒超时限制")
+
 if st.button("执行"):
-    if command.strip():
+    if command.strip() and background:
+        submit_job(command, lambda on_output, cancel: execute(
+            command, on_output=on_output, cancel=cancel
+        ))
+    elif command.strip():
         with st.spinner("执行中..."):
             output = run_command(command)
             st.code(output, language="bash")
     else:
         st.warning("请输入有效命令")
+
+job_panel()